@@ -1,19 +1,52 @@
 import os
-import pandas as pd
-import gspread
-from google.oauth2 import service_account
-from sqlalchemy.orm import Session
-from werkzeug.utils import secure_filename
-from utils.file_processing import process_csv
-from utils.google_sheets import connect_google_sheet
-from utils.database import UploadedData, SessionLocal
-from utils.search_api import search_entities
-from utils.groq_api import extract_information_with_groq  # Import the new function
-from config.config import UPLOAD_FOLDER, GOOGLE_SHEETS_API_KEY
-
-from flask import Flask, request, jsonify
+import json
+import logging
+import shutil
+import tempfile
+import time
+from utils.file_processing import ingest_csv
+from utils.batch_ingest import iter_ingest_files
+from utils.google_sheets import fetch_sheet_dataframe
+from utils.database import get_session
+from utils.search_api import iter_search_entities, search_cache
+from utils.extraction import iter_extract_entities
+from utils.groq_api import llm_cache
+from utils.dataset_store import (
+    new_dataset_id, dataset_path, dataset_info, read_table, read_column_values, save_dataframe
+)
+from utils.persistence import (
+    register_dataset, list_datasets, save_run, load_run, load_run_rows, list_runs, find_entity_results, RUN_TYPES,
+    purge_expired_datasets, start_dataset_sweeper
+)
+from utils.file_processing import records_for_json
+from utils.jobs import submit_job, get_job_status, get_job_results, cancel_job, resume_incomplete_jobs, start_job_sweeper, job_executor
+from utils.sheet_writes import create_sheet_write, run_sheet_write, get_sheet_write
+from utils.compression import GunzipRequestMiddleware, gzip_body
+from utils.entities import group_entities
+from utils.incremental import IncrementalRun, search_fingerprint, extract_fingerprint
+from utils.templating import render_dataset_rows, rows_search_results, key_by_row
+from utils.field_schema import parse_fields
+from utils.wire_format import ARROW_STREAM_MIMETYPE, prefers_arrow, table_to_ipc, dataframe_to_ipc
+from utils.metrics import span, http_request_seconds, render_metrics
+from config.config import UPLOAD_FOLDER, MAX_CONTENT_LENGTH, GZIP_MIN_BYTES, LOG_LEVEL
+
+import click
+from flask import Flask, Response, g, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+logging.basicConfig(level=LOG_LEVEL)
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """
+    Default JSON provider that records serialization time as the "json_serialize" stage.
+    """
+
+    def dumps(self, obj, **kwargs):
+        with span("json_serialize"):
+            return super().dumps(obj, **kwargs)
 
 app = Flask(__name__)
+app.json = TimedJSONProvider(app)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
@@ -23,14 +56,164 @@ GROQ_API_KEY = os.getenv('GROQ_API_KEY')
 if not SERPAPI_KEY:
     raise ValueError("SERPAPI_KEY environment variable is not set.")
 
+# Time every request for the http_request_seconds histogram
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    start = g.get('request_start')
+    if start is not None:
+        http_request_seconds.observe(
+            time.perf_counter() - start,
+            endpoint=request.url_rule.rule if request.url_rule else "unmatched",
+            method=request.method,
+            status=response.status_code,
+        )
+    return response
+
+# Accept gzipped JSON bodies (sent by the frontend for large payloads such as search results).
+# They are inflated in front of Flask, so every route reads the decompressed body.
+app.wsgi_app = GunzipRequestMiddleware(app.wsgi_app, MAX_CONTENT_LENGTH)
+
+# Gzip large JSON responses for clients that accept it; streamed responses are left as-is
+@app.after_request
+def compress_response(response):
+    if (
+        response.mimetype != 'application/json'
+        or response.is_streamed
+        or response.status_code < 200
+        or 'Content-Encoding' in response.headers
+        or 'gzip' not in request.headers.get('Accept-Encoding', '').lower()
+    ):
+        return response
+    body = response.get_data()
+    if len(body) < GZIP_MIN_BYTES:
+        return response
+    response.set_data(gzip_body(body))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
 # Dependency for database session
 def get_db():
-    db = SessionLocal()
+    db = get_session()
     try:
         yield db
     finally:
         db.close()
 
+def stream_ndjson(pairs, total, field, headers=None):
+    """
+    Stream (entity, value) pairs as newline-delimited JSON, one line per entity as it completes.
+    Each line also carries 'completed' and 'total' counts so clients can show progress.
+    """
+    def generate():
+        for completed, (entity, value) in enumerate(pairs, start=1):
+            yield json.dumps({"entity": str(entity), field: value, "completed": completed, "total": total}) + "\n"
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson", headers=headers)
+
+def arrow_response(serialize, *args):
+    """
+    Return an Arrow IPC stream body built by a utils.wire_format serializer.
+    """
+    with span("arrow_serialize"):
+        body = serialize(*args)
+    return Response(body, mimetype=ARROW_STREAM_MIMETYPE, headers={"Vary": "Accept"})
+
+def dedupe_headers(entities):
+    """
+    Report how many external calls entity deduplication saves for this request.
+    """
+    _, _, stats = group_entities(entities)
+    return {"X-Unique-Entities": str(stats["unique"]), "X-Calls-Saved": str(stats["calls_saved"])}
+
+def start_incremental_run(data, stage, entities, fingerprint):
+    """
+    Diff the rows against the previous run when the payload names a 'run_key'. Rows are numbered
+    from 'row_offset' (their position in the source, e.g. the sheet), defaulting to 'start_row'.
+    Returns the IncrementalRun, or None for a full run.
+    """
+    if not data.get('run_key'):
+        return None
+    row_offset = int(data.get('row_offset', data.get('start_row', 0)))
+    with span("incremental_diff"):
+        return IncrementalRun(str(data['run_key']), stage, entities, fingerprint, row_offset)
+
+def run_headers(entities, run):
+    """
+    Dedupe headers for the dispatched entities, plus reuse counts for an incremental run.
+    """
+    if run is None:
+        return dedupe_headers(entities)
+    return {**dedupe_headers(run.pending), **run.headers()}
+
+def persist_run(pairs, entities, run_type, run_id, data):
+    """
+    Pass (entity, value) pairs through, then store them as a run, in entity order, once all of
+    them have arrived.
+    """
+    completed = {}
+    for entity, value in pairs:
+        completed[str(entity)] = value
+        yield entity, value
+    results = {str(entity): completed[str(entity)] for entity in entities if str(entity) in completed}
+    save_run(results, run_type, run_id, data.get('dataset_id'), data.get('prompt_template'))
+
+def resolve_entities(data):
+    """
+    Return the entity list from 'entities', or read it from the stored dataset referenced by
+    'dataset_id' and 'column' (optionally limited to 'start_row'/'end_row').
+    Returns None if neither is given; raises KeyError for an unknown dataset or column.
+    """
+    if 'entities' in data:
+        return data['entities']
+    if 'dataset_id' in data and 'column' in data:
+        end_row = data.get('end_row')
+        return read_column_values(
+            data['dataset_id'], data['column'],
+            int(data.get('start_row', 0)), int(end_row) if end_row is not None else None
+        )
+    return None
+
+def template_rows(data):
+    """
+    Return {row ID: rendered text} when the payload references a stored dataset without a single
+    'column': 'prompt_template' may then name any of the dataset's columns, e.g.
+    "{company} {city} CEO email", and is rendered for every row in one vectorized pass.
+    Returns None otherwise; raises KeyError for an unknown dataset or column and ValueError for
+    an unsupported template.
+    """
+    if 'dataset_id' not in data or 'column' in data or 'entities' in data or 'prompt_template' not in data:
+        return None
+    end_row = data.get('end_row')
+    with span("render_template"):
+        return render_dataset_rows(
+            data['dataset_id'], data['prompt_template'],
+            int(data.get('start_row', 0)), int(end_row) if end_row is not None else None
+        )
+
+def resolve_fields(data):
+    """
+    Return the validated 'fields' schema of a structured extraction, or None if not given.
+    Raises ValueError for an invalid schema.
+    """
+    if data.get('fields') is None:
+        return None
+    return parse_fields(data['fields'])
+
+def resolve_search_results(data):
+    """
+    Return 'search_results' from the payload, or load the stored results referenced by 'results_id'.
+    Returns None if neither is given; raises KeyError for an unknown results ID.
+    """
+    if 'search_results' in data:
+        return data['search_results']
+    if 'results_id' in data:
+        return load_run(data['results_id'], "search")
+    return None
+
 # Route to handle CSV file upload and store metadata in PostgreSQL
 @app.route('/upload_csv', methods=['POST'])
 def upload_csv():
@@ -40,23 +223,89 @@ def upload_csv():
     file = request.files['file']
     start_row = int(request.form.get('start_row', 0))
     end_row = request.form.get('end_row', None)
+    if end_row is not None:
+        end_row = int(end_row)
+    preview_rows = int(request.form.get('preview_rows', 5))
 
-    df = pd.read_csv(file)
+    # Parse in chunks, keeping only the preview window in memory and storing the full file as Parquet
+    dataset_id = new_dataset_id()
+    with span("upload_parse"):
+        response, status = ingest_csv(file, dataset_path(dataset_id), start_row=start_row, end_row=end_row, preview_rows=preview_rows)
+    if status == 200:
+        response["dataset_id"] = dataset_id
+        register_dataset(dataset_id, response["columns"], response["row_count"], source=file.filename)
+        if prefers_arrow(request.headers.get('Accept')):
+            # Send the preview rows as Arrow, straight from the stored Parquet file
+            table = read_table(dataset_id, start_row, start_row + len(response.pop("preview")))
+            return arrow_response(table_to_ipc, table, response)
+    return jsonify(response), status
 
-    # Handle row slicing
+# Upload several CSV files in one request, parsed in parallel across CPU cores
+@app.route('/upload_csv_batch', methods=['POST'])
+def upload_csv_batch():
+    """
+    Endpoint to upload many CSV files at once, as repeated 'files' form fields. Each file is
+    stored as its own dataset; 'start_row', 'end_row' and 'preview_rows' apply to every file.
+    Returns {"files": [...]} with one /upload_csv-style result per file, in upload order, each
+    with its 'filename' and 'status'. Set 'stream' to true to receive NDJSON lines as each file
+    finishes instead.
+    """
+    files = [file for file in request.files.getlist('files') if file.filename]
+    if not files:
+        return jsonify({"error": "No files provided."}), 400
+
+    start_row = int(request.form.get('start_row', 0))
+    end_row = request.form.get('end_row', None)
     if end_row is not None:
         end_row = int(end_row)
-        df = df.iloc[start_row:end_row]
-    else:
-        df = df.iloc[start_row:]
+    preview_rows = int(request.form.get('preview_rows', 5))
+
+    # Spool the uploads to a temporary directory so worker processes can read them. It is removed
+    # once the batch is done, even if a file fails or the client disconnects.
+    spool_dir = tempfile.mkdtemp(prefix="batch-upload-")
 
-    columns = df.columns.tolist()
-    preview_data = df.head(5).to_dict(orient="records")
-    return jsonify({"columns": columns, "preview": preview_data}), 200
+    def discard_spool():
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+    uploads = []
+    try:
+        for file in files:
+            dataset_id = new_dataset_id()
+            src_path = os.path.join(spool_dir, f"{dataset_id}.csv")
+            file.save(src_path)
+            uploads.append((file.filename, src_path, dataset_id))
+    except Exception:
+        discard_spool()
+        raise
+
+    def file_results():
+        with span("batch_upload_parse"):
+            for index, response, status in iter_ingest_files(uploads, start_row, end_row, preview_rows):
+                filename, _, dataset_id = uploads[index]
+                if status == 200:
+                    response["dataset_id"] = dataset_id
+                    register_dataset(dataset_id, response["columns"], response["row_count"], source=filename)
+                yield index, {"filename": filename, "status": status, **response}
+
+    if request.form.get('stream', 'false').lower() == 'true':
+        def generate():
+            for completed, (_, result) in enumerate(file_results(), start=1):
+                yield json.dumps({**result, "completed": completed, "total": len(uploads)}) + "\n"
+        response = Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+        response.call_on_close(discard_spool)
+        return response
+
+    try:
+        results = dict(file_results())
+    finally:
+        discard_spool()
+    return jsonify({"files": [results[index] for index in range(len(uploads))]}), 200
 
 # Google Sheets processing endpoint with row range support
 @app.route('/connect_google_sheet', methods=['POST'])
 def google_sheet():
+    import gspread
+
     data = request.get_json()
     sheet_url = data.get('sheet_url')
     start_row = int(data.get('start_row', 0))
@@ -64,28 +313,22 @@ def google_sheet():
 
     if not sheet_url:
         return jsonify({"error": "Sheet URL missing."}), 400
+    if end_row is not None:
+        end_row = int(end_row)
 
     try:
-        # Set up Google Sheets API credentials
-        scopes = ["https://www.googleapis.com/auth/spreadsheets"]
-        credentials = service_account.Credentials.from_service_account_info(
-            GOOGLE_SHEETS_API_KEY, scopes=scopes
-        )
-        client = gspread.authorize(credentials)
-        sheet = client.open_by_url(sheet_url).sheet1
-        rows = sheet.get_all_values()
-        df = pd.DataFrame(rows[1:], columns=rows[0])
-
-        # Handle row slicing
-        if end_row is not None:
-            end_row = int(end_row)
-            df = df.iloc[start_row:end_row]
-        else:
-            df = df.iloc[start_row:]
+        # Fetch only the header and the requested rows, reusing the shared Sheets client
+        df = fetch_sheet_dataframe(sheet_url, start_row, end_row)
+
+        # Store the fetched rows so later calls can reference them by dataset ID
+        dataset_id = save_dataframe(df)
+        register_dataset(dataset_id, df.columns.tolist(), len(df), source=sheet_url)
 
         columns = df.columns.tolist()
+        if prefers_arrow(request.headers.get('Accept')):
+            return arrow_response(dataframe_to_ipc, df, {"columns": columns, "dataset_id": dataset_id})
         preview_data = df.to_dict(orient="records")
-        return jsonify({"columns": columns, "preview": preview_data}), 200
+        return jsonify({"columns": columns, "preview": preview_data, "dataset_id": dataset_id}), 200
 
     except gspread.exceptions.SpreadsheetNotFound:
         return jsonify({"error": "Spreadsheet not found. Check URL and access."}), 404
@@ -94,72 +337,314 @@ def google_sheet():
     except Exception as e:
         return jsonify({"error": f"Unexpected error: {e}"}), 500
 
+# Read a row window of a stored dataset
+@app.route('/datasets/<dataset_id>', methods=['GET'])
+def get_dataset(dataset_id):
+    start_row = int(request.args.get('start_row', 0))
+    end_row = request.args.get('end_row', None)
+    if end_row is not None:
+        end_row = int(end_row)
+
+    try:
+        info = dataset_info(dataset_id)
+        table = read_table(dataset_id, start_row, end_row)
+    except KeyError:
+        return jsonify({"error": "Dataset not found."}), 404
+
+    if prefers_arrow(request.headers.get('Accept')):
+        return arrow_response(table_to_ipc, table, info)
+    df = table.to_pandas()
+    return jsonify({"columns": info["columns"], "preview": records_for_json(df), "row_count": info["row_count"]}), 200
+
 # Web search for entities endpoint
 @app.route('/search_entities', methods=['POST'])
 def search_entities_endpoint():
     """
     Endpoint to perform web search for a list of entities using SerpAPI.
-    Expects JSON payload with 'entities' and 'prompt_template'.
+    Expects JSON payload with 'prompt_template' and either 'entities' or a stored dataset
+    reference ('dataset_id', 'column' and optional 'start_row'/'end_row').
+    Without 'column', the template can name any dataset columns and results are keyed by row ID.
+    Set 'stream' to true to receive NDJSON lines as each entity's search completes.
+    Give a 'run_key' to only search rows that are new or changed since the last run with that
+    key; other rows reuse their stored results.
+    The results are stored in the database; their ID is returned in the X-Results-Id header.
     """
     data = request.get_json()
+
+    try:
+        rows = template_rows(data)
+        entities = resolve_entities(data) if rows is None else list(rows.values())
+    except KeyError as e:
+        return jsonify({"error": f"Dataset or column not found: {e}"}), 404
+    except ValueError as e:
+        return jsonify({"error": f"Invalid prompt template: {e}"}), 400
     
     # Validate the payload
-    if 'entities' not in data or 'prompt_template' not in data:
-        return jsonify({"error": "Invalid payload. 'entities' and 'prompt_template' are required."}), 400
+    if entities is None or 'prompt_template' not in data:
+        return jsonify({"error": "Invalid payload. 'entities' (or 'dataset_id' and 'column') and 'prompt_template' are required."}), 400
 
-    entities = data['entities']
-    prompt_template = data['prompt_template']
+    # Rendered rows are searched as they are
+    prompt_template = data['prompt_template'] if rows is None else "{entity}"
+    run = start_incremental_run(data, "search", entities, search_fingerprint(prompt_template))
+    results_id = new_dataset_id()
+    headers = {"X-Results-Id": results_id, **run_headers(entities, run)}
+
+    if run is None:
+        pairs = iter_search_entities(entities, prompt_template, SERPAPI_KEY)
+    else:
+        pairs = run.merge(iter_search_entities(run.pending, prompt_template, SERPAPI_KEY))
+    if rows is not None:
+        pairs = key_by_row(pairs, rows)
+        entities = list(rows)
+    # Store the full results once all searches finish so extraction can reference them
+    pairs = persist_run(pairs, entities, "search", results_id, data)
+
+    if data.get('stream'):
+        return stream_ndjson(pairs, len(entities), "results", headers=headers)
     
     # Perform search for each entity
-    results = search_entities(entities, prompt_template, SERPAPI_KEY)
+    # JSON keys are strings anyway; converting up front keeps blank (None/NaN) entities serializable
+    completed = {str(entity): value for entity, value in pairs}
+    results = {str(entity): completed[str(entity)] for entity in entities}
     
-    return jsonify(results), 200
+    return jsonify(results), 200, headers
+
+# Prometheus-style metrics: stage timings, cache hits, retries and rate-limit waits
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+# Search cache hit/miss counters
+@app.route('/search_cache_stats', methods=['GET'])
+def search_cache_stats():
+    return jsonify(search_cache.stats()), 200
+
+# LLM extraction cache hit/miss counters
+@app.route('/llm_cache_stats', methods=['GET'])
+def llm_cache_stats():
+    return jsonify(llm_cache.stats()), 200
 
 @app.route('/extract_information', methods=['POST'])
 def extract_information():
     """
     Endpoint to send search results to the LLM (Groq) for information extraction.
-    Expects JSON payload with 'entities', 'search_results', and 'prompt_template'.
+    Expects JSON payload with 'prompt_template', either 'entities' or a stored dataset reference
+    ('dataset_id', 'column' and optional 'start_row'/'end_row'), and either 'search_results' or
+    the 'results_id' returned by /search_entities. An optional 'batch_size' answers several
+    entities per LLM call.
+    Give 'fields' (a list of names or {"name", "description", "type", "pattern"} objects) to
+    extract all of them in one JSON-mode call per entity; each result is then an object with
+    one value per field.
+    Without 'column', the template can name any dataset columns (plus {context}), search results
+    are looked up by row ID and results are keyed by row ID.
+    Set 'stream' to true to receive NDJSON lines as each entity's extraction completes.
+    Give a 'run_key' to only extract rows whose value, prompt or search results changed since
+    the last run with that key.
+    The results are stored in the database; their ID is returned in the X-Results-Id header.
     """
     data = request.get_json()
 
+    try:
+        rows = template_rows(data)
+        entities = resolve_entities(data) if rows is None else list(rows.values())
+        search_results = resolve_search_results(data)
+    except KeyError as e:
+        return jsonify({"error": f"Dataset or results not found: {e}"}), 404
+    except ValueError as e:
+        return jsonify({"error": f"Invalid prompt template: {e}"}), 400
+
     # Validate the payload
-    if 'entities' not in data or 'search_results' not in data or 'prompt_template' not in data:
-        return jsonify({"error": "Invalid payload. 'entities', 'search_results', and 'prompt_template' are required."}), 400
+    if entities is None or search_results is None or 'prompt_template' not in data:
+        return jsonify({"error": "Invalid payload. 'entities' (or 'dataset_id' and 'column'), 'search_results' (or 'results_id'), and 'prompt_template' are required."}), 400
+
+    try:
+        fields = resolve_fields(data)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid fields: {e}"}), 400
 
-    entities = data['entities']
-    search_results = data['search_results']
     prompt_template = data['prompt_template']
+    if rows is not None:
+        # Each row's rendered prompt stands in for the entity
+        search_results = rows_search_results(rows, search_results)
+        prompt_template = "{entity}"
+    # Optional: number of entities to answer per LLM completion
+    batch_size = data.get('batch_size')
+    run = start_incremental_run(data, "extract", entities, extract_fingerprint(prompt_template, search_results, fields))
+    results_id = new_dataset_id()
+    headers = {"X-Results-Id": results_id, **run_headers(entities, run)}
 
-    # Prepare extraction results
-    extraction_results = {}
+    if run is None:
+        pairs = iter_extract_entities(entities, search_results, prompt_template, batch_size=batch_size, fields=fields)
+    else:
+        pairs = run.merge(iter_extract_entities(run.pending, search_results, prompt_template, batch_size=batch_size, fields=fields))
+    if rows is not None:
+        pairs = key_by_row(pairs, rows)
+        entities = list(rows)
+    pairs = persist_run(pairs, entities, "extract", results_id, data)
 
-    for entity in entities:
-        # Ensure entity is a string for proper prompt replacement
-        entity_str = str(entity)
-        entity_search_results = search_results.get(entity_str, [])
+    if data.get('stream'):
+        return stream_ndjson(pairs, len(entities), "extracted_info", headers=headers)
 
-        # Replace {entity} placeholder in the prompt with the current entity's name
-        prompt = prompt_template.replace("{entity}", entity_str)
+    # Run extraction for all entities concurrently
+    completed = dict(pairs)
+    return jsonify({str(entity): completed[str(entity)] for entity in entities}), 200, headers
 
-        # Prepare search result context (assuming "snippet" is available)
-        context = "\n".join(result.get("snippet", "") for result in entity_search_results)
+# Stored datasets, newest first
+@app.route('/datasets', methods=['GET'])
+def datasets():
+    return jsonify(list_datasets(int(request.args.get('limit', 50)))), 200
 
-        # Replace {context} placeholder in the prompt with the actual context
-        prompt = prompt.replace("{context}", context)
+# Past search/extraction runs, newest first, optionally filtered by dataset and type
+@app.route('/runs', methods=['GET'])
+def runs():
+    run_type = request.args.get('type')
+    if run_type is not None and run_type not in RUN_TYPES:
+        return jsonify({"error": f"'type' must be one of {list(RUN_TYPES)}."}), 400
+    return jsonify(list_runs(request.args.get('dataset_id'), run_type, int(request.args.get('limit', 50)))), 200
 
-        # Send to Groq API for processing
+# Stored results of one run, keyed by entity in row order
+@app.route('/runs/<run_id>', methods=['GET'])
+def run_results(run_id):
+    try:
+        return jsonify(load_run(run_id)), 200
+    except KeyError:
+        return jsonify({"error": "Run not found."}), 404
+
+# Read a row window of a run's stored results, so large runs can be shown a page at a time
+@app.route('/runs/<run_id>/rows', methods=['GET'])
+def run_rows(run_id):
+    start_row = int(request.args.get('start_row', 0))
+    end_row = request.args.get('end_row', None)
+    if end_row is not None:
+        end_row = int(end_row)
+
+    try:
+        return jsonify(load_run_rows(run_id, start_row, end_row)), 200
+    except KeyError:
+        return jsonify({"error": "Run not found."}), 404
+
+# Stored results for one entity across past runs, without repeating the API calls
+@app.route('/entity_results', methods=['GET'])
+def entity_results():
+    entity = request.args.get('entity')
+    run_type = request.args.get('type')
+    if not entity:
+        return jsonify({"error": "'entity' is required."}), 400
+    if run_type is not None and run_type not in RUN_TYPES:
+        return jsonify({"error": f"'type' must be one of {list(RUN_TYPES)}."}), 400
+    return jsonify(find_entity_results(entity, run_type, int(request.args.get('limit', 10)))), 200
+
+# Write extracted values back to a column of the source Google Sheet
+@app.route('/sheets/write_back', methods=['POST'])
+def sheet_write_back():
+    """
+    Endpoint to write values into a column of a Google Sheet in a few batched API calls.
+    Expects JSON payload with 'sheet_url', 'column' (the header of the target column, added if
+    missing), 'values' (one per row, null to leave a cell unchanged) and optional 'start_row'
+    (the data row of the first value). If the write fails partway, the response carries the
+    'write_id' to pass to /sheets/write_back/<write_id>/resume.
+    """
+    data = request.get_json()
+    if not data.get('sheet_url') or not data.get('column') or not isinstance(data.get('values'), list):
+        return jsonify({"error": "Invalid payload. 'sheet_url', 'column' and a 'values' list are required."}), 400
+
+    write_id = create_sheet_write(data['sheet_url'], data['column'], data['values'], int(data.get('start_row', 0)))
+    status = run_sheet_write(write_id)
+    return jsonify(status), 200 if status["status"] == "completed" else 502
+
+@app.route('/sheets/write_back/<write_id>', methods=['GET'])
+def sheet_write_status(write_id):
+    status = get_sheet_write(write_id)
+    if status is None:
+        return jsonify({"error": "Write not found."}), 404
+    return jsonify(status), 200
+
+@app.route('/sheets/write_back/<write_id>/resume', methods=['POST'])
+def sheet_write_resume(write_id):
+    status = run_sheet_write(write_id)
+    if status is None:
+        return jsonify({"error": "Write not found."}), 404
+    return jsonify(status), 200 if status["status"] == "completed" else 502
+
+# Background jobs for long-running search/extraction runs
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """
+    Endpoint to queue a search or extraction run and return its job ID immediately.
+    Expects JSON payload with 'type' ("search" or "extract") plus the same fields as
+    /search_entities or /extract_information respectively.
+    """
+    data = request.get_json()
+    job_type = data.get('type')
+
+    if job_type not in ('search', 'extract'):
+        return jsonify({"error": "Invalid payload. 'type' must be 'search' or 'extract'."}), 400
+
+    try:
+        entities = resolve_entities(data)
+        search_results = resolve_search_results(data)
+    except KeyError as e:
+        return jsonify({"error": f"Dataset or results not found: {e}"}), 404
+
+    if entities is None or 'prompt_template' not in data or (job_type == 'extract' and search_results is None):
+        return jsonify({"error": "Invalid payload. Include the same fields as /search_entities or /extract_information."}), 400
+
+    payload = {"prompt_template": data['prompt_template']}
+    if job_type == 'extract':
         try:
-            extraction = extract_information_with_groq(prompt, entity_search_results)
-            if "error" not in extraction:
-                extraction_results[entity_str] = extraction.get("extracted_info", "No data found")
-            else:
-                extraction_results[entity_str] = f"Error: {extraction['error']}"
-        except Exception as e:
-            extraction_results[entity_str] = f"Error: {str(e)}"
+            payload["fields"] = resolve_fields(data)
+        except ValueError as e:
+            return jsonify({"error": f"Invalid fields: {e}"}), 400
+        payload["search_results"] = search_results
+        payload["batch_size"] = data.get('batch_size')
+    job_id = submit_job(job_type, entities, payload)
+    return jsonify({"job_id": job_id, "status": "pending"}), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    status = get_job_status(job_id)
+    if status is None:
+        return jsonify({"error": "Job not found."}), 404
+    return jsonify(status), 200
+
+@app.route('/jobs/<job_id>/results', methods=['GET'])
+def job_results(job_id):
+    results = get_job_results(job_id)
+    if results is None:
+        return jsonify({"error": "Job not found."}), 404
+    return jsonify(results), 200
 
-    return jsonify(extraction_results), 200
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def job_cancel(job_id):
+    status = cancel_job(job_id)
+    if status is None:
+        return jsonify({"error": "Job not found."}), 404
+    return jsonify({"job_id": job_id, "status": status}), 200
+
+@app.cli.command("resume-jobs")
+def resume_jobs_command():
+    """
+    Run jobs interrupted by a crash or restart to completion, e.g. for deployments whose server
+    does not start the job sweeper: flask --app app resume-jobs
+    """
+    job_ids = resume_incomplete_jobs()
+    click.echo(f"Resuming {len(job_ids)} jobs.")
+    job_executor.shutdown(wait=True)
+
+
+@app.cli.command("purge-datasets")
+def purge_datasets_command():
+    """
+    Delete stored datasets older than DATASET_RETENTION_DAYS: flask --app app purge-datasets
+    """
+    click.echo(f"Deleted {len(purge_expired_datasets())} datasets.")
 
 
 if __name__ == '__main__':
+    # Importing this module starts nothing. The sweepers resume interrupted jobs and, if
+    # DATASET_RETENTION_DAYS is set, delete expired datasets. They run only in the reloader's
+    # serving process, not in the parent that watches for file changes.
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_job_sweeper()
+        start_dataset_sweeper()
     app.run(debug=True)
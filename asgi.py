@@ -0,0 +1,197 @@
+import asyncio
+import json
+import threading
+from contextlib import asynccontextmanager
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+from utils.search_api import async_iter_search_entities
+from utils.extraction import async_iter_extract_entities
+from utils.google_sheets import fetch_sheet_dataframe
+from utils.dataset_store import new_dataset_id, save_dataframe
+from utils.persistence import register_dataset, save_run, start_dataset_sweeper
+from utils.compression import gunzip_limited
+from utils.wire_format import ARROW_STREAM_MIMETYPE, prefers_arrow, dataframe_to_ipc
+from config.config import MAX_CONTENT_LENGTH
+from utils.incremental import search_fingerprint, extract_fingerprint
+from utils.templating import rows_search_results, key_by_row_async
+from utils.jobs import start_job_sweeper
+from app import (
+    app as flask_app, resolve_entities, resolve_search_results, resolve_fields, template_rows, start_incremental_run,
+    run_headers, SERPAPI_KEY
+)
+
+# Async serving mode: the network-bound endpoints below run on the event loop, and every
+# other route is served by the Flask app. Run with: uvicorn asgi:app --port 5000
+
+def stream_ndjson(pairs, total, field, headers=None):
+    """
+    Async counterpart of app.stream_ndjson: stream (entity, value) pairs from an async
+    iterator as newline-delimited JSON.
+    """
+    async def generate():
+        completed = 0
+        async for entity, value in pairs:
+            completed += 1
+            yield json.dumps({"entity": str(entity), field: value, "completed": completed, "total": total}) + "\n"
+    return StreamingResponse(generate(), media_type="application/x-ndjson", headers=headers)
+
+async def persist_run(pairs, entities, run_type, run_id, data):
+    """
+    Async counterpart of app.persist_run: pass pairs through, then store them as a run.
+    """
+    completed = {}
+    async for entity, value in pairs:
+        completed[str(entity)] = value
+        yield entity, value
+    results = {str(entity): completed[str(entity)] for entity in entities if str(entity) in completed}
+    await asyncio.to_thread(save_run, results, run_type, run_id, data.get('dataset_id'), data.get('prompt_template'))
+
+async def read_json(request):
+    """
+    Parse the JSON body, decompressing it first if the client sent it gzipped.
+    """
+    try:
+        body = await request.body()
+        if request.headers.get("content-encoding", "").lower() == "gzip":
+            body = gunzip_limited(body, MAX_CONTENT_LENGTH)
+        return json.loads(body)
+    except ValueError:
+        return None
+
+# Google Sheets processing endpoint with row range support
+async def google_sheet(request):
+    import gspread
+
+    data = await read_json(request) or {}
+    sheet_url = data.get('sheet_url')
+    start_row = int(data.get('start_row', 0))
+    end_row = data.get('end_row', None)
+
+    if not sheet_url:
+        return JSONResponse({"error": "Sheet URL missing."}, status_code=400)
+    if end_row is not None:
+        end_row = int(end_row)
+
+    try:
+        # gspread has no async API, so the fetch runs in a worker thread off the event loop
+        df = await asyncio.to_thread(fetch_sheet_dataframe, sheet_url, start_row, end_row)
+        dataset_id = await asyncio.to_thread(save_dataframe, df)
+        await asyncio.to_thread(register_dataset, dataset_id, df.columns.tolist(), len(df), sheet_url)
+        if prefers_arrow(request.headers.get("accept")):
+            body = await asyncio.to_thread(dataframe_to_ipc, df, {"columns": df.columns.tolist(), "dataset_id": dataset_id})
+            return Response(body, media_type=ARROW_STREAM_MIMETYPE, headers={"Vary": "Accept"})
+        return JSONResponse({"columns": df.columns.tolist(), "preview": df.to_dict(orient="records"), "dataset_id": dataset_id})
+
+    except gspread.exceptions.SpreadsheetNotFound:
+        return JSONResponse({"error": "Spreadsheet not found. Check URL and access."}, status_code=404)
+    except gspread.exceptions.APIError as e:
+        return JSONResponse({"error": f"Google Sheets API error: {e}"}, status_code=500)
+    except Exception as e:
+        return JSONResponse({"error": f"Unexpected error: {e}"}, status_code=500)
+
+# Web search for entities endpoint
+async def search_entities_endpoint(request):
+    """
+    Async version of the Flask /search_entities endpoint, with the same payload and response.
+    """
+    data = await read_json(request) or {}
+
+    try:
+        # Dataset reads and stored-run loads hit disk and the database, so they run off the event loop
+        rows = await asyncio.to_thread(template_rows, data)
+        entities = await asyncio.to_thread(resolve_entities, data) if rows is None else list(rows.values())
+    except KeyError as e:
+        return JSONResponse({"error": f"Dataset or column not found: {e}"}, status_code=404)
+    except ValueError as e:
+        return JSONResponse({"error": f"Invalid prompt template: {e}"}, status_code=400)
+
+    if entities is None or 'prompt_template' not in data:
+        return JSONResponse({"error": "Invalid payload. 'entities' (or 'dataset_id' and 'column') and 'prompt_template' are required."}, status_code=400)
+
+    # Rendered rows are searched as they are
+    prompt_template = data['prompt_template'] if rows is None else "{entity}"
+    results_id = new_dataset_id()
+    run = await asyncio.to_thread(start_incremental_run, data, "search", entities, search_fingerprint(prompt_template))
+    headers = {"X-Results-Id": results_id, **run_headers(entities, run)}
+    if run is None:
+        pairs = async_iter_search_entities(entities, prompt_template, SERPAPI_KEY)
+    else:
+        pairs = run.merge_async(async_iter_search_entities(run.pending, prompt_template, SERPAPI_KEY))
+    if rows is not None:
+        pairs = key_by_row_async(pairs, rows)
+        entities = list(rows)
+    # Store the full results once all searches finish so extraction can reference them
+    pairs = persist_run(pairs, entities, "search", results_id, data)
+
+    if data.get('stream'):
+        return stream_ndjson(pairs, len(entities), "results", headers=headers)
+
+    completed = {str(entity): value async for entity, value in pairs}
+    return JSONResponse({str(entity): completed[str(entity)] for entity in entities}, headers=headers)
+
+async def extract_information(request):
+    """
+    Async version of the Flask /extract_information endpoint, with the same payload and response.
+    """
+    data = await read_json(request) or {}
+
+    try:
+        rows = await asyncio.to_thread(template_rows, data)
+        entities = await asyncio.to_thread(resolve_entities, data) if rows is None else list(rows.values())
+        search_results = await asyncio.to_thread(resolve_search_results, data)
+    except KeyError as e:
+        return JSONResponse({"error": f"Dataset or results not found: {e}"}, status_code=404)
+    except ValueError as e:
+        return JSONResponse({"error": f"Invalid prompt template: {e}"}, status_code=400)
+
+    if entities is None or search_results is None or 'prompt_template' not in data:
+        return JSONResponse({"error": "Invalid payload. 'entities' (or 'dataset_id' and 'column'), 'search_results' (or 'results_id'), and 'prompt_template' are required."}, status_code=400)
+
+    try:
+        fields = resolve_fields(data)
+    except ValueError as e:
+        return JSONResponse({"error": f"Invalid fields: {e}"}, status_code=400)
+
+    prompt_template = data['prompt_template']
+    if rows is not None:
+        # Each row's rendered prompt stands in for the entity
+        search_results = rows_search_results(rows, search_results)
+        prompt_template = "{entity}"
+    results_id = new_dataset_id()
+    run = await asyncio.to_thread(start_incremental_run, data, "extract", entities, extract_fingerprint(prompt_template, search_results, fields))
+    headers = {"X-Results-Id": results_id, **run_headers(entities, run)}
+    if run is None:
+        pairs = async_iter_extract_entities(entities, search_results, prompt_template, batch_size=data.get('batch_size'), fields=fields)
+    else:
+        pairs = run.merge_async(async_iter_extract_entities(
+            run.pending, search_results, prompt_template, batch_size=data.get('batch_size'), fields=fields
+        ))
+    if rows is not None:
+        pairs = key_by_row_async(pairs, rows)
+        entities = list(rows)
+    pairs = persist_run(pairs, entities, "extract", results_id, data)
+
+    if data.get('stream'):
+        return stream_ndjson(pairs, len(entities), "extracted_info", headers=headers)
+
+    completed = {str(entity): value async for entity, value in pairs}
+    return JSONResponse({str(entity): completed[str(entity)] for entity in entities}, headers=headers)
+
+@asynccontextmanager
+async def lifespan(app):
+    # Resume interrupted jobs (and delete expired datasets, if retention is set) once the server
+    # starts, rather than when this module is imported
+    stop = threading.Event()
+    start_job_sweeper(stop)
+    start_dataset_sweeper(stop)
+    yield
+    stop.set()
+
+app = Starlette(lifespan=lifespan, routes=[
+    Route('/connect_google_sheet', google_sheet, methods=['POST']),
+    Route('/search_entities', search_entities_endpoint, methods=['POST']),
+    Route('/extract_information', extract_information, methods=['POST']),
+    Mount('/', app=WSGIMiddleware(flask_app)),
+])
@@ -0,0 +1,274 @@
+"""
+Benchmark the upload, Sheets fetch, search and extract paths of the Flask backend against
+local stand-ins for SerpAPI, Groq and Google Sheets.
+
+Usage:
+    python -m benchmarks.bench_pipeline --rows 1000 10000 100000 --output bench.json
+
+For every dataset size the harness uploads a synthetic CSV, fetches a synthetic sheet, then
+searches and extracts the first --search-rows entities through the real endpoints. It reports
+rows/sec, p50/p95/p99 latency and peak RSS per stage as JSON so runs can be compared.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def latency_summary(seconds):
+    return {
+        "p50_ms": _ms(percentile(seconds, 50)),
+        "p95_ms": _ms(percentile(seconds, 95)),
+        "p99_ms": _ms(percentile(seconds, 99)),
+        "mean_ms": _ms(statistics.fmean(seconds)) if seconds else None,
+    }
+
+
+def _ms(value):
+    return None if value is None else round(value * 1000, 3)
+
+
+def current_rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # Not on Linux: fall back to the lifetime peak (KB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if platform.system() == "Darwin" else peak * 1024
+
+
+class RssSampler:
+    """
+    Sample the process RSS in a background thread and keep the peak seen while active.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss_bytes())
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.peak = current_rss_bytes()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss_bytes())
+
+
+def synthetic_csv(rows):
+    buffer = io.StringIO()
+    buffer.write("company,city,industry,employees\n")
+    for i in range(rows):
+        buffer.write(f"Company {i},City {i % 500},Industry {i % 40},{i % 10000}\n")
+    return buffer.getvalue().encode("utf-8")
+
+
+def configure_environment(args, workdir):
+    """
+    Point the backend at throwaway storage and match its client-side limits to the fakes.
+    Must run before the backend modules are imported.
+    """
+    os.environ.setdefault("GOOGLE_SHEETS_API_KEY", "{}")
+    os.environ.setdefault("SERPAPI_KEY", "benchmark")
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    os.environ["DATABASE_URI"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["CACHE_FOLDER"] = os.path.join(workdir, "cache")
+    os.environ["SEARCH_RATE_LIMIT"] = str(args.search_rate_limit)
+    os.environ["SEARCH_BURST"] = str(max(1, int(args.search_rate_limit)))
+    os.environ["LLM_RATE_LIMIT"] = str(args.llm_rate_limit)
+    os.environ["LLM_BURST"] = str(max(1, int(args.llm_rate_limit)))
+    # Retries should cost the pipeline little, so both stages back off for the same short time
+    os.environ["SEARCH_BACKOFF_BASE"] = str(args.backoff_base)
+    os.environ["LLM_BACKOFF_BASE"] = str(args.backoff_base)
+
+
+def install_fakes(args, sheet_rows):
+    from benchmarks.fakes import (
+        FakeProvider, make_fake_google_search, make_fake_groq_client, make_fake_sheets_client
+    )
+    import utils.search_api as search_api
+    import utils.groq_api as groq_api
+    import utils.google_sheets as google_sheets
+
+    providers = {
+        "serpapi": FakeProvider(args.search_latency, error_rate=args.error_rate, rate_limit=args.search_rate_limit, seed=1),
+        "groq": FakeProvider(args.llm_latency, error_rate=args.error_rate, rate_limit=args.llm_rate_limit, seed=2),
+        "sheets": FakeProvider(args.sheets_latency, error_rate=0.0, seed=3),
+    }
+    search_api.GoogleSearch = make_fake_google_search(providers["serpapi"])
+    groq_api.client = make_fake_groq_client(providers["groq"])
+    google_sheets._client = make_fake_sheets_client(providers["sheets"], sheet_rows)
+    google_sheets._sheet_cache.clear()
+    search_api.search_cache.clear()
+    search_api.empty_search_cache.clear()
+    groq_api.llm_cache.clear()
+    return providers
+
+
+def timed_stream(client, path, payload):
+    """
+    POST a streaming request and return (total seconds, per-entity completion times).
+    """
+    start = time.perf_counter()
+    response = client.post(path, json={**payload, "stream": True}, buffered=False)
+    line_times = []
+    for chunk in response.response:
+        for line in chunk.splitlines():
+            if line.strip():
+                line_times.append(time.perf_counter() - start)
+    total = time.perf_counter() - start
+    headers = dict(response.headers)
+    response.close()
+    return total, line_times, headers
+
+
+def run_stage(name, rows, repeat, fn):
+    durations = []
+    per_row = []
+    with RssSampler() as rss:
+        for _ in range(repeat):
+            duration, row_latencies = fn()
+            durations.append(duration)
+            per_row.extend(row_latencies)
+    total = sum(durations)
+    return {
+        "stage": name,
+        "rows": rows,
+        "repeat": repeat,
+        "rows_per_sec": round(rows * repeat / total, 3) if total else None,
+        "request_latency": latency_summary(durations),
+        "row_latency": latency_summary(per_row) if per_row else None,
+        "peak_rss_mb": round(rss.peak / (1024 * 1024), 2),
+    }
+
+
+def benchmark_size(app, args, rows):
+    client = app.test_client()
+    providers = install_fakes(args, rows)
+    csv_bytes = synthetic_csv(rows)
+    search_rows = min(rows, args.search_rows)
+    state = {}
+    results = []
+
+    def upload():
+        start = time.perf_counter()
+        response = client.post(
+            "/upload_csv",
+            data={"file": (io.BytesIO(csv_bytes), "bench.csv"), "start_row": "0", "end_row": "5"},
+        )
+        state["dataset_id"] = response.get_json()["dataset_id"]
+        return time.perf_counter() - start, []
+
+    def sheets():
+        import utils.google_sheets as google_sheets
+        google_sheets._sheet_cache.clear()
+        start = time.perf_counter()
+        client.post("/connect_google_sheet", json={"sheet_url": "https://fake", "start_row": 0, "end_row": args.sheet_window})
+        return time.perf_counter() - start, []
+
+    def search():
+        import utils.search_api as search_api
+        search_api.search_cache.clear()
+        search_api.empty_search_cache.clear()
+        total, line_times, headers = timed_stream(client, "/search_entities", {
+            "dataset_id": state["dataset_id"], "column": "company", "start_row": 0, "end_row": search_rows,
+            "prompt_template": "{entity} contact email",
+        })
+        state["results_id"] = headers.get("X-Results-Id")
+        return total, line_times
+
+    def extract():
+        import utils.groq_api as groq_api
+        groq_api.llm_cache.clear()
+        total, line_times, _ = timed_stream(client, "/extract_information", {
+            "dataset_id": state["dataset_id"], "column": "company", "start_row": 0, "end_row": search_rows,
+            "results_id": state["results_id"], "prompt_template": "Extract the email address of {entity}",
+            "batch_size": args.batch_size,
+        })
+        return total, line_times
+
+    results.append(run_stage("upload", rows, args.repeat, upload))
+    results.append(run_stage("sheets_fetch", min(rows, args.sheet_window), args.repeat, sheets))
+    results.append(run_stage("search", search_rows, args.repeat, search))
+    results.append(run_stage("extract", search_rows, args.repeat, extract))
+    for result in results:
+        result["dataset_rows"] = rows
+    return results, {name: provider.stats() for name, provider in providers.items()}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000], help="Synthetic dataset sizes (up to 1000000).")
+    parser.add_argument("--search-rows", type=int, default=200, help="Entities searched and extracted per dataset.")
+    parser.add_argument("--sheet-window", type=int, default=1000, help="Rows fetched from the synthetic sheet.")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions per stage.")
+    parser.add_argument("--search-latency", type=float, default=0.05, help="Fake SerpAPI latency in seconds.")
+    parser.add_argument("--llm-latency", type=float, default=0.1, help="Fake Groq latency in seconds.")
+    parser.add_argument("--sheets-latency", type=float, default=0.05, help="Fake Sheets API latency in seconds.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake calls that fail.")
+    parser.add_argument("--search-rate-limit", type=float, default=50, help="Fake SerpAPI requests per second.")
+    parser.add_argument("--llm-rate-limit", type=float, default=20, help="Fake Groq requests per second.")
+    parser.add_argument("--backoff-base", type=float, default=0.05, help="Search and LLM retry backoff base in seconds.")
+    parser.add_argument("--batch-size", type=int, default=1, help="Entities per LLM completion.")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.output:
+        args.output = os.path.abspath(args.output)
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    configure_environment(args, workdir)
+    os.chdir(workdir)  # Keeps uploads written by the backend out of the repository
+
+    import logging
+    logging.disable(logging.INFO)
+    from app import app
+
+    report = {"config": vars(args), "python": platform.python_version(), "results": [], "providers": {}}
+    # Keep backend debug output off stdout so the report stays machine-readable
+    with contextlib.redirect_stdout(sys.stderr):
+        for rows in args.rows:
+            results, provider_stats = benchmark_size(app, args, rows)
+            report["results"].extend(results)
+            report["providers"][str(rows)] = provider_stats
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Measure backend startup: the cold import of the Flask app and the latency of its first requests.
+
+Usage:
+    python -m benchmarks.bench_startup --repeat 5 --budget 1.0
+
+Every repetition runs in a fresh interpreter against throwaway storage, so nothing is warm.
+It reports the import time, the first /metrics request (no external clients) and the first
+/datasets request (creates the database engine) as JSON, and exits with status 1 if the median
+import time exceeds --budget seconds. A run fails if importing app already created the engine,
+since the first /datasets timing would then leave out its cost.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child interpreter; prints one JSON object of timings in seconds
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+from utils import database
+if database._engine is not None:
+    sys.exit("Importing app created the database engine")
+client = app.app.test_client()
+timings = {"import_s": imported - start}
+for name, path in (("first_metrics_s", "/metrics"), ("first_datasets_s", "/datasets")):
+    begin = time.perf_counter()
+    status = client.get(path).status_code
+    timings[name] = time.perf_counter() - begin
+    if status != 200:
+        sys.exit(f"GET {path} returned {status}")
+print(json.dumps(timings))
+"""
+
+
+def run_once(workdir):
+    env = dict(os.environ)
+    env.setdefault("GOOGLE_SHEETS_API_KEY", "{}")
+    env.setdefault("SERPAPI_KEY", "benchmark")
+    env.setdefault("GROQ_API_KEY", "benchmark")
+    env["DATABASE_URI"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    env["CACHE_FOLDER"] = os.path.join(workdir, "cache")
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters to start.")
+    parser.add_argument("--budget", type=float, default=1.0, help="Maximum median import time in seconds.")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    samples = []
+    for _ in range(args.repeat):
+        with tempfile.TemporaryDirectory(prefix="bench-startup-") as workdir:
+            samples.append(run_once(workdir))
+
+    report = {"repeat": args.repeat, "budget_s": args.budget}
+    for name in samples[0]:
+        values = [sample[name] for sample in samples]
+        report[name] = {"median": round(statistics.median(values), 4), "max": round(max(values), 4)}
+    report["within_budget"] = report["import_s"]["median"] <= args.budget
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0 if report["within_budget"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""
+Local stand-ins for SerpAPI, Groq and Google Sheets used by the benchmark harness.
+
+Each fake simulates network latency, a random error rate and a provider-side rate limit,
+so the pipeline can be measured end to end without external calls or API quota.
+"""
+import random
+import threading
+import time
+import types
+import httpx
+from groq import RateLimitError, APIConnectionError
+
+
+class FakeProvider:
+    """
+    Shared latency / error / rate-limit behaviour for the fake clients.
+    """
+
+    def __init__(self, latency=0.05, jitter=0.5, error_rate=0.0, rate_limit=None, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._window_calls = 0
+
+    def call(self):
+        """
+        Simulate one request. Returns "ok", "error" or "rate_limited".
+        """
+        with self._lock:
+            self.calls += 1
+            now = time.monotonic()
+            if now - self._window_start >= 1.0:
+                self._window_start = now
+                self._window_calls = 0
+            self._window_calls += 1
+            over_limit = self.rate_limit is not None and self._window_calls > self.rate_limit
+            failed = self._random.random() < self.error_rate
+            delay = self.latency * (1 + self._random.uniform(-self.jitter, self.jitter))
+
+        if over_limit:
+            with self._lock:
+                self.rate_limited += 1
+            return "rate_limited"
+        time.sleep(max(delay, 0))
+        if failed:
+            with self._lock:
+                self.errors += 1
+            return "error"
+        return "ok"
+
+    def remaining(self):
+        """
+        Requests left in the current one-second window, as reported in rate-limit headers.
+        """
+        with self._lock:
+            if self.rate_limit is None:
+                return None
+            return max(0, int(self.rate_limit - self._window_calls))
+
+    def stats(self):
+        return {"calls": self.calls, "errors": self.errors, "rate_limited": self.rate_limited}
+
+
+def make_fake_google_search(provider, results_per_query=5):
+    """
+    Return a drop-in replacement for `serpapi.GoogleSearch` backed by `provider`.
+    """
+
+    class FakeGoogleSearch:
+        def __init__(self, params):
+            self.params = params
+
+        def get_dict(self):
+            outcome = provider.call()
+            if outcome == "rate_limited":
+                return {"error": "Your searches have exceeded the hourly throughput limit. Please try again later."}
+            if outcome == "error":
+                raise ConnectionError("Simulated SerpAPI failure.")
+            query = self.params["q"]
+            return {
+                "organic_results": [
+                    {
+                        "title": f"{query} result {i}",
+                        "link": f"https://example.com/{i}",
+                        "snippet": f"Contact for {query}: person{i}@example.com, +1-555-010{i}",
+                    }
+                    for i in range(results_per_query)
+                ]
+            }
+
+    return FakeGoogleSearch
+
+
+def _completion(content):
+    message = types.SimpleNamespace(content=content)
+    return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+
+def make_fake_groq_client(provider):
+    """
+    Return an object shaped like `groq.Groq` whose chat completions are served by `provider`.
+    """
+    request = httpx.Request("POST", "https://fake-groq.local/openai/v1/chat/completions")
+
+    def create(messages, model, **params):
+        outcome = provider.call()
+        if outcome == "rate_limited":
+            response = httpx.Response(429, request=request, headers={"retry-after": "1"})
+            raise RateLimitError("Simulated rate limit.", response=response, body=None)
+        if outcome == "error":
+            raise APIConnectionError(request=request)
+        content = messages[-1]["content"]
+        if params.get("response_format", {}).get("type") == "json_object":
+            items = content.count("### Item")
+            return _completion("{" + ", ".join(f'"{i}": "answer {i}"' for i in range(1, items + 1)) + "}")
+        return _completion(f"person@example.com ({len(content)} chars of context)")
+
+    def create_with_raw_response(messages, model, **params):
+        completion = create(messages, model, **params)
+        headers = httpx.Headers()
+        remaining = provider.remaining()
+        if remaining is not None:
+            headers["x-ratelimit-remaining-requests"] = str(remaining)
+            headers["x-ratelimit-reset-requests"] = "1s"
+        return types.SimpleNamespace(headers=headers, parse=lambda: completion)
+
+    completions = types.SimpleNamespace(
+        create=create, with_raw_response=types.SimpleNamespace(create=create_with_raw_response)
+    )
+    return types.SimpleNamespace(chat=types.SimpleNamespace(completions=completions))
+
+
+class FakeWorksheet:
+    """
+    Worksheet with `rows` synthetic data rows, generated on demand so large sheets cost no memory.
+    """
+
+    def __init__(self, provider, rows, columns):
+        self.provider = provider
+        self.columns = columns
+        self.row_count = rows + 1
+
+    def _row(self, index):
+        return [f"{column}_{index}" for column in self.columns]
+
+    def _check(self):
+        outcome = self.provider.call()
+        if outcome != "ok":
+            raise ConnectionError(f"Simulated Sheets {outcome}.")
+
+    def row_values(self, row):
+        self._check()
+        return list(self.columns) if row == 1 else self._row(row - 2)
+
+    def get(self, range_name):
+        self._check()
+        first, last = (int(part) for part in range_name.split(":"))
+        last = min(last, self.row_count)
+        return [list(self.columns) if row == 1 else self._row(row - 2) for row in range(first, last + 1)]
+
+
+def make_fake_sheets_client(provider, rows, columns=("company", "city", "industry")):
+    """
+    Return an object shaped like an authorized gspread client serving one synthetic sheet.
+    """
+    worksheet = FakeWorksheet(provider, rows, columns)
+    spreadsheet = types.SimpleNamespace(
+        id=f"fake-sheet-{rows}",
+        sheet1=worksheet,
+        get_lastUpdateTime=lambda: "2024-01-01T00:00:00Z",
+    )
+    return types.SimpleNamespace(open_by_url=lambda url: spreadsheet)
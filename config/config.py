@@ -1,5 +1,4 @@
 import os
-import json
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -8,13 +7,38 @@ load_dotenv()
 # Configurations for file uploads and other settings
 UPLOAD_FOLDER = os.path.join(os.getcwd(), 'uploads')
 MAX_CONTENT_LENGTH = 1024 * 1024 * 1024  # 1 GB
+CSV_CHUNK_SIZE = int(os.getenv("CSV_CHUNK_SIZE", 50000))  # Rows parsed per chunk during upload
+CSV_SCHEMA_SAMPLE_ROWS = int(os.getenv("CSV_SCHEMA_SAMPLE_ROWS", 10000))  # Rows used to infer column types
+GZIP_MIN_BYTES = int(os.getenv("GZIP_MIN_BYTES", 64 * 1024))  # JSON responses above this size are gzipped
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", os.cpu_count() or 1))  # Processes parsing batch uploads in parallel
 
-# Google Sheets API Key (loaded as JSON from .env)
-GOOGLE_SHEETS_API_KEY = json.loads(os.getenv("GOOGLE_SHEETS_API_KEY"))
+# Google Sheets service account key (JSON from .env, parsed when the Sheets client is first used)
+GOOGLE_SHEETS_API_KEY = os.getenv("GOOGLE_SHEETS_API_KEY")
+SHEETS_PAGE_SIZE = int(os.getenv("SHEETS_PAGE_SIZE", 5000))  # Rows fetched per Sheets API call
+SHEETS_CACHE_MAX_ENTRIES = int(os.getenv("SHEETS_CACHE_MAX_ENTRIES", 32))  # Cached sheet windows kept in memory
+SHEETS_WRITE_BATCH_ROWS = int(os.getenv("SHEETS_WRITE_BATCH_ROWS", 5000))  # Rows written per Sheets API call
+SHEETS_WRITE_RATE_LIMIT = float(os.getenv("SHEETS_WRITE_RATE_LIMIT", 1))  # Write calls per second (quota is 60 per minute per user)
+SHEETS_WRITE_MAX_RETRIES = int(os.getenv("SHEETS_WRITE_MAX_RETRIES", 3))  # Retries for throttled or transient write failures
+SHEETS_WRITE_BACKOFF_BASE = float(os.getenv("SHEETS_WRITE_BACKOFF_BASE", 2.0))  # Seconds, doubled on each retry
 
 # SerpAPI key
 SERPAPI_KEY = os.getenv("SERPAPI_KEY")
 
+# Search concurrency settings (adjust based on your SerpAPI plan)
+SEARCH_MAX_WORKERS = int(os.getenv("SEARCH_MAX_WORKERS", 8))  # Max searches in flight
+SEARCH_RATE_LIMIT = float(os.getenv("SEARCH_RATE_LIMIT", 5))  # Searches per second
+SEARCH_BURST = int(os.getenv("SEARCH_BURST", 5))  # Searches allowed back-to-back
+SEARCH_MAX_RETRIES = int(os.getenv("SEARCH_MAX_RETRIES", 3))  # Retries for throttled or transient search failures
+SEARCH_BACKOFF_BASE = float(os.getenv("SEARCH_BACKOFF_BASE", 1.0))  # Seconds, doubled on each retry
+
+# Local result caches (SQLite files under CACHE_FOLDER)
+CACHE_FOLDER = os.getenv("CACHE_FOLDER", os.path.join(os.getcwd(), 'cache'))
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", 7 * 24 * 3600))  # Seconds before a cached search expires
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", 100000))  # LRU eviction beyond this size
+SEARCH_EMPTY_CACHE_TTL = int(os.getenv("SEARCH_EMPTY_CACHE_TTL", 24 * 3600))  # Seconds before a cached "no results" answer expires
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600))  # Seconds before a cached completion expires
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 100000))  # LRU eviction beyond this size
+
 # PostgreSQL settings
 POSTGRES_USER = os.getenv("POSTGRES_USER")
 POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD")
@@ -23,19 +47,38 @@ POSTGRES_HOST = os.getenv("POSTGRES_HOST")
 POSTGRES_PORT = os.getenv("POSTGRES_PORT")
 GROQ_API_KEY = os.getenv('GROQ_API_KEY')
 
-# PostgreSQL connection URI
-DATABASE_URI = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+# LLM extraction settings (defaults match the Groq free tier of 30 requests per minute)
+LLM_MODEL = os.getenv("LLM_MODEL", "llama3-8b-8192")
+LLM_MAX_WORKERS = int(os.getenv("LLM_MAX_WORKERS", 4))  # Max LLM calls in flight
+LLM_RATE_LIMIT = float(os.getenv("LLM_RATE_LIMIT", 0.5))  # LLM calls per second
+LLM_BURST = int(os.getenv("LLM_BURST", 4))  # LLM calls allowed back-to-back
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 3))  # Retries for rate limits and transient errors
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", 1.0))  # Seconds, doubled on each retry
+LLM_BATCH_SIZE = int(os.getenv("LLM_BATCH_SIZE", 1))  # Entities per completion (1 disables batching)
+LLM_CONTEXT_TOKEN_BUDGET = int(os.getenv("LLM_CONTEXT_TOKEN_BUDGET", 3000))  # Search-result tokens per completion (llama3-8b-8192 has an 8192-token window)
+
+# Logging and instrumentation
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", 0))  # Fraction of calls whose raw payloads are logged at DEBUG
+
+# Stored dataset retention
+DATASET_RETENTION_DAYS = float(os.getenv("DATASET_RETENTION_DAYS", 0))  # Datasets older than this are deleted (0, the default, keeps them)
+DATASET_SWEEP_INTERVAL = int(os.getenv("DATASET_SWEEP_INTERVAL", 3600))  # Seconds between retention sweeps
+
+# Rows per executemany batch when bulk-loading results into databases without COPY
+PERSIST_BATCH_ROWS = int(os.getenv("PERSIST_BATCH_ROWS", 10000))
+
+# Background job settings
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))  # Jobs processed at the same time
+JOB_HEARTBEAT_TIMEOUT = int(os.getenv("JOB_HEARTBEAT_TIMEOUT", 60))  # Seconds without a heartbeat before a running job is taken over
+
+# PostgreSQL connection URI (set DATABASE_URI to override, e.g. with a SQLite URI for local runs)
+DATABASE_URI = os.getenv(
+    "DATABASE_URI",
+    f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+)
 
 # Langchain Settings
 LANGCHAIN_API_KEY = os.getenv("LANGCHAIN_API_KEY")  # Langchain API key
 LANGCHAIN_ENDPOINT = os.getenv("LANGCHAIN_ENDPOINT", "https://api.smith.langchain.com")  # Default endpoint
 LANGCHAIN_PROJECT = os.getenv("LANGCHAIN_PROJECT", "default_project")  # Your Langchain project name
-
-# Print the configuration to verify it's loaded correctly
-print(f"Loaded Configurations:")
-print(f"Upload Folder: {UPLOAD_FOLDER}")
-print(f"Max Content Length: {MAX_CONTENT_LENGTH}")
-print(f"PostgreSQL URI: {DATABASE_URI}")
-print(f"Langchain Endpoint: {LANGCHAIN_ENDPOINT}")
-print(f"Langchain Project: {LANGCHAIN_PROJECT}")
-
@@ -1,12 +1,23 @@
 import streamlit as st
 import pandas as pd
+from collections import deque
 from utils.query_processing import (
-    load_data_from_backend,
+    stream_upload_files_via_backend,
+    load_dataset_rows,
     load_data_from_google_sheet,
-    search_entities_via_backend
+    load_run_rows,
+    load_run_results,
+    stream_search_entities_via_backend,
+    stream_extract_information_via_backend,
+    write_back_to_google_sheet
 )
-import requests
 import io
+import math
+
+# Result tables show one page at a time, fetched from the backend's stored run
+PAGE_SIZES = [25, 50, 100, 250]
+# Most recent results shown while a run is streaming
+LIVE_ROWS = 10
 
 st.title("AI Dashboard")
 
@@ -19,19 +30,33 @@ if "selected_file" not in st.session_state:
     st.session_state.selected_file = None
 if "file_upload_preview_data" not in st.session_state:
     st.session_state.file_upload_preview_data = pd.DataFrame()
-if "search_results_file" not in st.session_state:
-    st.session_state.search_results_file = {}
-if "extraction_results_file" not in st.session_state:
-    st.session_state.extraction_results_file = {}
+if "search_results_id_file" not in st.session_state:
+    st.session_state.search_results_id_file = None
+if "row_keys_file" not in st.session_state:
+    st.session_state.row_keys_file = None
+if "extraction_results_id_file" not in st.session_state:
+    st.session_state.extraction_results_id_file = None
+if "extraction_csv_file" not in st.session_state:
+    st.session_state.extraction_csv_file = None
 
 if "sheet_columns" not in st.session_state:
     st.session_state.sheet_columns = []
 if "sheet_preview_data" not in st.session_state:
     st.session_state.sheet_preview_data = pd.DataFrame()
-if "search_results_sheet" not in st.session_state:
-    st.session_state.search_results_sheet = {}
-if "extraction_results_sheet" not in st.session_state:
-    st.session_state.extraction_results_sheet = {}
+if "sheet_dataset_id" not in st.session_state:
+    st.session_state.sheet_dataset_id = None
+if "search_results_id_sheet" not in st.session_state:
+    st.session_state.search_results_id_sheet = None
+if "row_keys_sheet" not in st.session_state:
+    st.session_state.row_keys_sheet = None
+if "extraction_results_id_sheet" not in st.session_state:
+    st.session_state.extraction_results_id_sheet = None
+if "extraction_csv_sheet" not in st.session_state:
+    st.session_state.extraction_csv_sheet = None
+if "extraction_fields_sheet" not in st.session_state:
+    st.session_state.extraction_fields_sheet = None
+if "sheet_write" not in st.session_state:
+    st.session_state.sheet_write = None
 
 # Function to reset session state for file uploads
 def reset_file_upload_state():
@@ -39,15 +64,177 @@ def reset_file_upload_state():
     st.session_state.selected_file = None
     st.session_state.file_uploader_key += 1
     st.session_state.file_upload_preview_data = pd.DataFrame()
-    st.session_state.search_results_file = {}
-    st.session_state.extraction_results_file = {}
+    st.session_state.search_results_id_file = None
+    st.session_state.row_keys_file = None
+    st.session_state.extraction_results_id_file = None
+    st.session_state.extraction_csv_file = None
 
 # Function to reset session state for Google Sheets data
 def reset_google_sheets_state():
     st.session_state.sheet_columns = []
     st.session_state.sheet_preview_data = pd.DataFrame()
-    st.session_state.search_results_sheet = {}
-    st.session_state.extraction_results_sheet = {}
+    st.session_state.sheet_dataset_id = None
+    st.session_state.search_results_id_sheet = None
+    st.session_state.row_keys_sheet = None
+    st.session_state.extraction_results_id_sheet = None
+    st.session_state.extraction_csv_sheet = None
+    st.session_state.extraction_fields_sheet = None
+    st.session_state.sheet_write = None
+
+# Flatten (entity, search results) pairs into one table row per result
+def search_results_table(pairs):
+    rows = []
+    for entity, results in pairs:
+        if not results:
+            rows.append({"Entity": entity, "Title": "No results found.", "Link": None, "Snippet": None})
+        for result in results:
+            rows.append({
+                "Entity": entity,
+                "Title": result.get("title", "No Title"),
+                "Link": result.get("link", "No Link"),
+                "Snippet": result.get("snippet", "No Snippet")
+            })
+    return pd.DataFrame(rows, columns=["Entity", "Title", "Link", "Snippet"])
+
+# Structured extraction answers with one value per field, shown and exported as one column each
+def extraction_record(info):
+    return info if isinstance(info, dict) else {"Extracted Info": info}
+
+def extraction_results_table(pairs):
+    return pd.DataFrame([{"Entity": entity, **extraction_record(info)} for entity, info in pairs])
+
+# One field of a structured answer as a sheet cell; list fields are joined
+def sheet_value(info, field):
+    if not isinstance(info, dict):
+        return info
+    value = info.get(field)
+    return ", ".join(value) if isinstance(value, list) else value
+
+# Parse the comma-separated field names of a structured extraction; None for a free-text one
+def parse_field_names(text):
+    names = [name.strip() for name in text.split(",") if name.strip()]
+    return names or None
+
+# Show one page of a stored run as a single table. Only that page is fetched from the backend,
+# so redrawing costs the same however many rows the run has.
+def render_results_page(results_id, to_table, key):
+    size_col, page_col = st.columns(2)
+    with size_col:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, key=f"{key}_page_size")
+    with page_col:
+        page = st.number_input("Page", min_value=1, step=1, key=f"{key}_page")
+
+    start_row = (page - 1) * page_size
+    rows, row_count = load_run_rows(results_id, start_row, start_row + page_size)
+    if rows is None:
+        return
+    pages = max(1, math.ceil(row_count / page_size))
+    if not rows and row_count:
+        st.warning(f"Page {page} is past the last page ({pages}).")
+        return
+    st.dataframe(to_table((row["entity"], row["result"]) for row in rows), use_container_width=True, hide_index=True)
+    st.caption(f"Rows {start_row + 1 if rows else 0}-{start_row + len(rows)} of {row_count} (page {page} of {pages})")
+
+# '{placeholder}' and '{entity}' stand for the selected column; other columns can be named directly
+def column_template(prompt_template, placeholder_column):
+    column = "{" + placeholder_column + "}"
+    return prompt_template.replace("{placeholder}", column).replace("{entity}", column)
+
+# Return the dataset reference, prompt template and result keys for a search. A prompt that names
+# columns besides the selected one is rendered by the backend for every row, and its results are
+# keyed by row ID (the returned row keys); otherwise the selected column fills {entity}.
+def search_request(dataset_ref, prompt_template, placeholder_column, columns):
+    other_columns = [column for column in columns if column != placeholder_column]
+    if dataset_ref and any("{" + column + "}" in prompt_template for column in other_columns):
+        row_ref = {key: value for key, value in dataset_ref.items() if key != "column"}
+        row_keys = [str(row) for row in range(row_ref["start_row"], row_ref["end_row"])]
+        return row_ref, column_template(prompt_template, placeholder_column), row_keys
+    return dataset_ref, prompt_template.replace("{placeholder}", "{entity}"), None
+
+# Extraction follows the search: rendered per row if the search was, so results line up by row ID
+def extraction_request(dataset_ref, prompt_template, placeholder_column, row_keys):
+    if row_keys:
+        return {key: value for key, value in dataset_ref.items() if key != "column"}, column_template(prompt_template, placeholder_column)
+    return dataset_ref, prompt_template
+
+# Build the extraction CSV in the order of the entity list, from the stored run
+def extraction_csv(results_id, entities):
+    results = load_run_results(results_id)
+    if results is None:
+        return None
+    ordered = {str(entity): extraction_record(results[str(entity)]) for entity in entities if str(entity) in results}
+    return pd.DataFrame.from_dict(ordered, orient='index').to_csv(index=True)
+
+# Tell the user how many rows were answered without an extra API call: reused from the last
+# run, or duplicate/blank rows sharing one result
+def show_dedupe_stats(response_headers, action):
+    rows_reused = int(response_headers.get("X-Rows-Reused", 0))
+    if rows_reused:
+        st.caption(f"{rows_reused} unchanged rows reused their results from the last run.")
+    calls_saved = int(response_headers.get("X-Calls-Saved", 0))
+    if calls_saved:
+        unique = response_headers.get("X-Unique-Entities")
+        st.caption(f"{action} {unique} unique entities; {calls_saved} duplicate or blank rows reused their results.")
+
+# Run the search as a stream, showing progress and the latest results as they arrive.
+# Returns the ID the backend stored the results under.
+def run_streamed_search(entities, prompt_template, dataset_ref=None):
+    progress = st.progress(0.0, text="Searching...")
+    live_results = st.empty()
+    latest = deque(maxlen=LIVE_ROWS)
+    response_headers = {}
+    for line in stream_search_entities_via_backend(entities, prompt_template, dataset_ref, response_headers):
+        latest.append((line["entity"], line["results"]))
+        progress.progress(line["completed"] / line["total"], text=f"Searched {line['completed']} of {line['total']} entities")
+        live_results.dataframe(search_results_table(latest), use_container_width=True, hide_index=True)
+    # The full, ordered results are paged below once the stream is done
+    live_results.empty()
+    progress.empty()
+    show_dedupe_stats(response_headers, "Searched")
+    return response_headers.get("X-Results-Id")
+
+# Run the LLM extraction as a stream, showing progress and the latest answers as they arrive.
+# Returns the ID the backend stored the results under.
+def run_streamed_extraction(entities, prompt_template, dataset_ref=None, results_id=None, fields=None):
+    progress = st.progress(0.0, text="Processing with LLM...")
+    live_results = st.empty()
+    latest = deque(maxlen=LIVE_ROWS)
+    response_headers = {}
+    for line in stream_extract_information_via_backend(entities, None, prompt_template, dataset_ref, results_id, response_headers, fields):
+        latest.append((line["entity"], line["extracted_info"]))
+        progress.progress(line["completed"] / line["total"], text=f"Extracted {line['completed']} of {line['total']} entities")
+        live_results.dataframe(extraction_results_table(latest), use_container_width=True, hide_index=True)
+    live_results.empty()
+    progress.empty()
+    show_dedupe_stats(response_headers, "Extracted")
+    return response_headers.get("X-Results-Id")
+
+# Upload new files in one batch request. The backend parses them in parallel, and each file's
+# status is updated as soon as it is done.
+def upload_files(files, preview_start, preview_end):
+    progress = st.progress(0.0, text=f"Uploading {len(files)} files...")
+    file_status = {file.name: st.empty() for file in files}
+    for name, status in file_status.items():
+        status.caption(f"{name}: processing...")
+
+    for result in stream_upload_files_via_backend(files, start_row=preview_start, end_row=preview_end):
+        name = result["filename"]
+        progress.progress(result["completed"] / result["total"], text=f"Loaded {result['completed']} of {result['total']} files")
+        if result["status"] != 200:
+            file_status[name].error(f"An error occurred while loading '{name}': {result['error']}")
+        elif result["preview"].empty:
+            file_status[name].warning(f"No data available in the selected range of '{name}'. Please adjust the range.")
+        else:
+            columns = result["columns"]
+            st.session_state.uploaded_files_data[name] = {
+                "columns": columns,
+                "preview_data": result["preview"][columns],
+                "dataset_id": result["dataset_id"],
+                "preview_range": (preview_start, preview_end)
+            }
+            st.session_state.file_upload_preview_data = result["preview"][columns]
+            file_status[name].empty()
+    progress.empty()
 
 # Initialize session state for view selection
 if "view_mode" not in st.session_state:
@@ -76,20 +263,23 @@ if st.session_state.view_mode == "file_upload":
 
     # Load each file's data and store it in session state
     if uploaded_files:
+        new_files = []
         for uploaded_file in uploaded_files:
-            if uploaded_file.name not in st.session_state.uploaded_files_data:
-                try:
-                    columns, preview_data = load_data_from_backend(uploaded_file, start_row=preview_start, end_row=preview_end)
-                    if columns is not None and not preview_data.empty:
-                        st.session_state.uploaded_files_data[uploaded_file.name] = {
-                            "columns": columns,
-                            "preview_data": preview_data[columns]
-                        }
-                        st.session_state.file_upload_preview_data = preview_data[columns]
-                    else:
-                        st.warning("No data available in the selected range. Please adjust the range.")
-                except Exception as e:
-                    st.error(f"An error occurred while loading '{uploaded_file.name}': {str(e)}")
+            file_data = st.session_state.uploaded_files_data.get(uploaded_file.name)
+            if file_data is not None and file_data["preview_range"] != (preview_start, preview_end):
+                # Already uploaded: fetch the new row range from the stored dataset instead of re-uploading
+                columns, preview_data = load_dataset_rows(file_data["dataset_id"], start_row=preview_start, end_row=preview_end)
+                if columns is not None:
+                    file_data["preview_data"] = preview_data[columns]
+                    file_data["preview_range"] = (preview_start, preview_end)
+            elif file_data is None:
+                new_files.append(uploaded_file)
+
+        if new_files:
+            try:
+                upload_files(new_files, preview_start, preview_end)
+            except Exception as e:
+                st.error(f"An error occurred while uploading files: {str(e)}")
 
     # Display file preview options if files are uploaded
     if st.session_state.uploaded_files_data:
@@ -100,6 +290,7 @@ if st.session_state.view_mode == "file_upload":
         file_data = st.session_state.uploaded_files_data[st.session_state.selected_file]
         columns = file_data["columns"]
         preview_data = file_data["preview_data"]
+        preview_start_row = file_data["preview_range"][0]
 
         # Display full columns within the selected row range in original order
         st.write(f"Preview of selected rows for '{st.session_state.selected_file}':", preview_data)
@@ -114,75 +305,69 @@ if st.session_state.view_mode == "file_upload":
 
         # Prompt template input for dynamic query generation
         st.write("### Dynamic Query Input with Prompt Template")
-        prompt_template = st.text_input("Enter a custom prompt (use '{placeholder}' to insert entity value)", value="Get me the contact information for {placeholder}")
+        prompt_template = st.text_input("Enter a custom prompt (use '{placeholder}' to insert entity value, or '{column name}' for any other column)", value="Get me the contact information for {placeholder}")
         st.session_state.prompt_template = prompt_template
 
         # Generate queries based on the selected column and search range
         if placeholder_column:
             entities = preview_data[placeholder_column].iloc[search_start:search_end].tolist()
-            prompt_template = prompt_template.replace("{placeholder}", "{entity}")
+
+            # The backend reads the entities from its stored copy of the file
+            dataset_ref = None
+            if file_data.get("dataset_id"):
+                dataset_ref = {
+                    "dataset_id": file_data["dataset_id"],
+                    "column": placeholder_column,
+                    "start_row": preview_start_row + search_start,
+                    "end_row": preview_start_row + search_end
+                }
+                if st.checkbox("Only process rows that are new or changed since the last run (File Upload)"):
+                    dataset_ref["run_key"] = f"file:{st.session_state.selected_file}:{placeholder_column}"
+            search_ref, search_template, row_keys = search_request(dataset_ref, prompt_template, placeholder_column, columns)
 
             # Perform web search using SerpAPI and display results in the order of entities
             if st.button("Perform Web Search for Entities (File Upload)"):
                 try:
-                    with st.spinner("Searching..."):
-                        search_results = search_entities_via_backend(entities, prompt_template)
-                        st.session_state.search_results_file = search_results
+                    st.session_state.search_results_id_file = run_streamed_search(entities, search_template, search_ref)
+                    st.session_state.row_keys_file = row_keys
+                    st.session_state.search_file_page = 1
                 except Exception as e:
                     st.error(f"An error occurred during search: {str(e)}")
 
-            # Display search results if available, ordered by entity list
-            if "search_results_file" in st.session_state:
+            # Display search results if available, one page at a time in entity order
+            if st.session_state.search_results_id_file:
                 st.write("### Search Results (File Upload)")
-                for entity in entities:
-                    results = st.session_state.search_results_file.get(str(entity), [])
-                    st.write(f"Results for '{entity}':")
-                    if results:
-                        for result in results:
-                            title = result.get("title", "No Title")
-                            link = result.get("link", "No Link")
-                            snippet = result.get("snippet", "No Snippet")
-                            st.write(f"- **[{title}]({link})**: {snippet}")
-                    else:
-                        st.write("No results found.")
-                    st.write("---")
+                render_results_page(st.session_state.search_results_id_file, search_results_table, "search_file")
 
         # Section for LLM-based information extraction for File Upload
-        if "search_results_file" in st.session_state:
+        if st.session_state.search_results_id_file:
             st.write("### Extract Specific Information Using LLM for File Upload")
             user_prompt = st.text_input("Enter LLM prompt for file data", value="Extract the email address of {entity}")
+            field_names = parse_field_names(st.text_input("Fields to extract in one LLM call, comma-separated (optional, e.g. email, phone, linkedin)", key="extraction_fields_input_file"))
 
             if st.button("Extract Information with LLM (File Upload)"):
                 try:
-                    with st.spinner("Processing with LLM..."):
-                        response = requests.post(
-                            "http://localhost:5000/extract_information",
-                            json={
-                                "entities": entities,
-                                "search_results": st.session_state.search_results_file,
-                                "prompt_template": user_prompt
-                            }
-                        )
-                        if response.status_code == 200:
-                            try:
-                                st.session_state.extraction_results_file = response.json()
-                            except requests.exceptions.JSONDecodeError:
-                                st.error("Failed to decode JSON response from the server.")
-                        else:
-                            st.error(f"Request failed with status code {response.status_code}: {response.text}")
-                except requests.RequestException as e:
+                    extract_ref, extract_template = extraction_request(dataset_ref, user_prompt, placeholder_column, st.session_state.row_keys_file)
+                    st.session_state.extraction_results_id_file = run_streamed_extraction(
+                        entities, extract_template, extract_ref, st.session_state.search_results_id_file, field_names
+                    )
+                    st.session_state.extraction_file_page = 1
+                    st.session_state.extraction_csv_file = None
+                except Exception as e:
                     st.error(f"An error occurred during the LLM extraction: {str(e)}")
 
             # Display extracted data for file upload
-            if "extraction_results_file" in st.session_state:
+            if st.session_state.extraction_results_id_file:
                 st.write("### Extracted Information (File Upload)")
-                for entity, info in st.session_state.extraction_results_file.items():
-                    st.write(f"{entity}: {info}")
-
-                # Download button for extracted data as CSV
-                extracted_data_file = pd.DataFrame.from_dict(st.session_state.extraction_results_file, orient='index', columns=["Extracted Info"])
-                csv_file = extracted_data_file.to_csv(index=True)
-                st.download_button("Download Extracted Data (File Upload)", data=csv_file, file_name="extracted_data_file.csv", mime="text/csv")
+                render_results_page(st.session_state.extraction_results_id_file, extraction_results_table, "extraction_file")
+
+                # The CSV holds every row, so it is only built when asked for
+                if st.session_state.extraction_csv_file is None:
+                    if st.button("Prepare CSV Download (File Upload)"):
+                        st.session_state.extraction_csv_file = extraction_csv(st.session_state.extraction_results_id_file, st.session_state.row_keys_file or entities)
+                        st.rerun()
+                else:
+                    st.download_button("Download Extracted Data (File Upload)", data=st.session_state.extraction_csv_file, file_name="extracted_data_file.csv", mime="text/csv")
                     
     # Clear File Upload Data
     if st.button("Clear File Upload Data"):
@@ -202,10 +387,11 @@ elif st.session_state.view_mode == "google_sheets":
 
     if st.button("Connect to Google Sheets"):
         try:
-            columns, preview_data = load_data_from_google_sheet(sheet_url, start_row=preview_start, end_row=preview_end)
+            columns, preview_data, dataset_id = load_data_from_google_sheet(sheet_url, start_row=preview_start, end_row=preview_end)
             if columns is not None and preview_data is not None:
                 st.session_state.sheet_columns = columns
                 st.session_state.sheet_preview_data = preview_data[columns]
+                st.session_state.sheet_dataset_id = dataset_id
             else:
                 st.warning("No data available in the selected range. Please adjust the range.")
         except Exception as e:
@@ -225,74 +411,100 @@ elif st.session_state.view_mode == "google_sheets":
 
         # Prompt template input
         st.write("### Dynamic Query Input with Prompt Template (Google Sheets)")
-        prompt_template = st.text_input("Enter a custom prompt (use '{placeholder}' to insert entity value)", value="Get me the contact information for {placeholder}")
+        prompt_template = st.text_input("Enter a custom prompt (use '{placeholder}' to insert entity value, or '{column name}' for any other column)", value="Get me the contact information for {placeholder}")
         st.session_state.prompt_template = prompt_template
 
         # Generate and perform search
         if placeholder_column:
             entities = st.session_state.sheet_preview_data[placeholder_column].iloc[search_start:search_end].tolist()
-            prompt_template = prompt_template.replace("{placeholder}", "{entity}")
+
+            # The backend reads the entities from its stored copy of the previewed rows
+            dataset_ref = None
+            if st.session_state.sheet_dataset_id:
+                dataset_ref = {
+                    "dataset_id": st.session_state.sheet_dataset_id,
+                    "column": placeholder_column,
+                    "start_row": search_start,
+                    "end_row": search_end
+                }
+                if st.checkbox("Only process rows that are new or changed since the last run (Google Sheets)"):
+                    dataset_ref["run_key"] = f"sheet:{sheet_url}:{placeholder_column}"
+                    # Number rows by their position in the sheet, not in the previewed window
+                    dataset_ref["row_offset"] = preview_start + search_start
+            search_ref, search_template, row_keys = search_request(dataset_ref, prompt_template, placeholder_column, st.session_state.sheet_columns)
 
             if st.button("Perform Web Search for Entities (Google Sheets)"):
                 try:
-                    with st.spinner("Searching..."):
-                        search_results = search_entities_via_backend(entities, prompt_template)
-                        st.session_state.search_results_sheet = search_results
+                    st.session_state.search_results_id_sheet = run_streamed_search(entities, search_template, search_ref)
+                    st.session_state.row_keys_sheet = row_keys
+                    st.session_state.search_sheet_page = 1
                 except Exception as e:
                     st.error(f"An error occurred during search: {str(e)}")
 
-            # Display search results in the order of the selected entities
-            if "search_results_sheet" in st.session_state:
+            # Display search results one page at a time, in the order of the selected entities
+            if st.session_state.search_results_id_sheet:
                 st.write("### Search Results (Google Sheets)")
-                for entity in entities:
-                    results = st.session_state.search_results_sheet.get(str(entity), [])
-                    st.write(f"Results for '{entity}':")
-                    if results:
-                        for result in results:
-                            title = result.get("title", "No Title")
-                            link = result.get("link", "No Link")
-                            snippet = result.get("snippet", "No Snippet")
-                            st.write(f"- **[{title}]({link})**: {snippet}")
-                    else:
-                        st.write("No results found.")
-                    st.write("---")
+                render_results_page(st.session_state.search_results_id_sheet, search_results_table, "search_sheet")
 
         # Section for LLM-based information extraction for Google Sheets
-        if "search_results_sheet" in st.session_state:
+        if st.session_state.search_results_id_sheet:
             st.write("### Extract Specific Information Using LLM for Google Sheets")
             user_prompt = st.text_input("Enter LLM prompt for Google Sheets data", value="Extract the email address of {entity}")
+            field_names = parse_field_names(st.text_input("Fields to extract in one LLM call, comma-separated (optional, e.g. email, phone, linkedin) (Google Sheets)", key="extraction_fields_input_sheet"))
 
             if st.button("Extract Information with LLM (Google Sheets)"):
                 try:
-                    with st.spinner("Processing with LLM..."):
-                        response = requests.post(
-                            "http://localhost:5000/extract_information",
-                            json={
-                                "entities": entities,
-                                "search_results": st.session_state.search_results_sheet,
-                                "prompt_template": user_prompt
-                            }
-                        )
-                        if response.status_code == 200:
-                            try:
-                                st.session_state.extraction_results_sheet = response.json()
-                            except requests.exceptions.JSONDecodeError:
-                                st.error("Failed to decode JSON response from the server.")
-                        else:
-                            st.error(f"Request failed with status code {response.status_code}: {response.text}")
-                except requests.RequestException as e:
+                    extract_ref, extract_template = extraction_request(dataset_ref, user_prompt, placeholder_column, st.session_state.row_keys_sheet)
+                    st.session_state.extraction_results_id_sheet = run_streamed_extraction(
+                        entities, extract_template, extract_ref, st.session_state.search_results_id_sheet, field_names
+                    )
+                    st.session_state.extraction_fields_sheet = field_names
+                    st.session_state.extraction_sheet_page = 1
+                    st.session_state.extraction_csv_sheet = None
+                except Exception as e:
                     st.error(f"An error occurred during the LLM extraction: {str(e)}")
 
             # Display extracted data for Google Sheets
-            if "extraction_results_sheet" in st.session_state:
+            if st.session_state.extraction_results_id_sheet:
                 st.write("### Extracted Information (Google Sheets)")
-                for entity, info in st.session_state.extraction_results_sheet.items():
-                    st.write(f"{entity}: {info}")
-
-                # Download button for extracted data as CSV
-                extracted_data_sheet = pd.DataFrame.from_dict(st.session_state.extraction_results_sheet, orient='index', columns=["Extracted Info"])
-                csv_sheet = extracted_data_sheet.to_csv(index=True)
-                st.download_button("Download Extracted Data (Google Sheets)", data=csv_sheet, file_name="extracted_data_sheet.csv", mime="text/csv")
+                render_results_page(st.session_state.extraction_results_id_sheet, extraction_results_table, "extraction_sheet")
+
+                # The CSV holds every row, so it is only built when asked for
+                if st.session_state.extraction_csv_sheet is None:
+                    if st.button("Prepare CSV Download (Google Sheets)"):
+                        st.session_state.extraction_csv_sheet = extraction_csv(st.session_state.extraction_results_id_sheet, st.session_state.row_keys_sheet or entities)
+                        st.rerun()
+                else:
+                    st.download_button("Download Extracted Data (Google Sheets)", data=st.session_state.extraction_csv_sheet, file_name="extracted_data_sheet.csv", mime="text/csv")
+
+                # Write the extracted values back into the sheet, next to the rows they came from
+                target_column = st.text_input("Column to write extracted data to (created if missing)", value="Extracted Info")
+                # A structured extraction writes one of its fields per column
+                write_field = None
+                if st.session_state.extraction_fields_sheet:
+                    write_field = st.selectbox("Field to write", st.session_state.extraction_fields_sheet)
+                if st.button("Write Extracted Data to Google Sheet"):
+                    extraction_results = load_run_results(st.session_state.extraction_results_id_sheet)
+                    if extraction_results is not None:
+                        values = [extraction_results.get(str(key)) for key in st.session_state.row_keys_sheet or entities]
+                        if write_field:
+                            values = [sheet_value(value, write_field) for value in values]
+                        with st.spinner("Writing to Google Sheets..."):
+                            st.session_state.sheet_write = write_back_to_google_sheet(
+                                sheet_url, target_column, values, start_row=preview_start + search_start
+                            )
+
+                sheet_write = st.session_state.sheet_write
+                if sheet_write and sheet_write["status"] == "completed":
+                    st.success(f"Wrote {sheet_write['rows_written']} rows to column '{sheet_write['column']}'.")
+                elif sheet_write:
+                    st.warning(f"Writing stopped after {sheet_write['rows_written']} of {sheet_write['total']} rows: {sheet_write['error']}")
+                    if st.button("Resume Writing to Google Sheet"):
+                        with st.spinner("Writing to Google Sheets..."):
+                            st.session_state.sheet_write = write_back_to_google_sheet(
+                                sheet_url, target_column, None, write_id=sheet_write["write_id"]
+                            ) or sheet_write
+                        st.rerun()
 
     # Clear Google Sheets Data
     if st.button("Clear Google Sheets Data"):
@@ -0,0 +1,73 @@
+import gzip
+import json
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Frontend-side settings; the frontend does not load config.config, which needs backend credentials
+BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:5000")
+BACKEND_CONNECT_TIMEOUT = float(os.getenv("BACKEND_CONNECT_TIMEOUT", 5))  # Seconds to open a connection
+BACKEND_READ_TIMEOUT = float(os.getenv("BACKEND_READ_TIMEOUT", 120))  # Seconds to wait between response bytes
+BACKEND_MAX_RETRIES = int(os.getenv("BACKEND_MAX_RETRIES", 3))  # Retries for idempotent calls
+BACKEND_POOL_SIZE = int(os.getenv("BACKEND_POOL_SIZE", 10))  # Keep-alive connections kept open
+GZIP_MIN_BYTES = int(os.getenv("GZIP_MIN_BYTES", 64 * 1024))  # Request bodies above this size are gzipped
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """
+    Return the shared keep-alive session used for every backend call.
+    Only idempotent requests (GET/HEAD) are retried on 5xx responses or dropped reads, with
+    exponential backoff. Connection failures are retried for all methods, since those requests
+    never reached the backend.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=BACKEND_MAX_RETRIES,
+                backoff_factor=0.5,
+                status_forcelist=(502, 503, 504),
+                allowed_methods=frozenset({"GET", "HEAD"}),
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(pool_connections=BACKEND_POOL_SIZE, pool_maxsize=BACKEND_POOL_SIZE, max_retries=retry)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+def encode_json_body(payload):
+    """
+    Serialize `payload` as a JSON request body, gzipped if it is larger than GZIP_MIN_BYTES.
+    Returns (body, headers).
+    """
+    body = json.dumps(payload).encode("utf-8")
+    headers = {"Content-Type": "application/json"}
+    if len(body) >= GZIP_MIN_BYTES:
+        body = gzip.compress(body, compresslevel=5)
+        headers["Content-Encoding"] = "gzip"
+    return body, headers
+
+def backend_get(path, params=None, **kwargs):
+    """
+    GET a backend endpoint through the shared session.
+    """
+    kwargs.setdefault("timeout", (BACKEND_CONNECT_TIMEOUT, BACKEND_READ_TIMEOUT))
+    return get_session().get(f"{BACKEND_URL}{path}", params=params, **kwargs)
+
+def backend_post(path, json_payload=None, **kwargs):
+    """
+    POST to a backend endpoint through the shared session. A `json_payload` is sent as a
+    (possibly gzipped) JSON body; other keyword arguments such as `files` pass through to requests.
+    """
+    kwargs.setdefault("timeout", (BACKEND_CONNECT_TIMEOUT, BACKEND_READ_TIMEOUT))
+    if json_payload is not None:
+        body, headers = encode_json_body(json_payload)
+        kwargs["data"] = body
+        kwargs["headers"] = {**headers, **kwargs.get("headers", {})}
+    return get_session().post(f"{BACKEND_URL}{path}", **kwargs)
@@ -0,0 +1,84 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from utils.dataset_store import dataset_path
+from utils.file_processing import ingest_csv_file
+from config.config import INGEST_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# Worker processes, started on first use. "spawn" avoids forking the threaded server process.
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_ingest_executor():
+    """
+    Return the shared process pool that parses batch uploads, creating it on first use.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=INGEST_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+def _discard_executor(executor):
+    """
+    Drop a pool whose worker died, so the next batch starts a fresh one.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+def _submit_all(executor, uploads, start_row, end_row, preview_rows):
+    return {
+        executor.submit(ingest_csv_file, src_path, dataset_path(dataset_id), start_row, end_row, preview_rows): index
+        for index, (_, src_path, dataset_id) in enumerate(uploads)
+    }
+
+def iter_ingest_files(uploads, start_row=0, end_row=None, preview_rows=5):
+    """
+    Parse uploaded CSV files in parallel, one worker process per file, and store each as a dataset.
+
+    Args:
+        uploads: list of (filename, path of the saved upload, dataset ID) tuples.
+
+    Yields:
+        (index in `uploads`, response dict, HTTP status code) as each file finishes, like
+        `ingest_csv`. The saved uploads are deleted once parsed.
+    """
+    futures = {}
+    try:
+        executor = get_ingest_executor()
+        try:
+            futures = _submit_all(executor, uploads, start_row, end_row, preview_rows)
+        except BrokenProcessPool:
+            _discard_executor(executor)
+            executor = get_ingest_executor()
+            futures = _submit_all(executor, uploads, start_row, end_row, preview_rows)
+
+        for future in as_completed(futures):
+            index = futures[future]
+            filename, src_path, _ = uploads[index]
+            try:
+                response, status = future.result()
+            except Exception as e:
+                logger.error(f"Ingesting '{filename}' failed: {e}")
+                if isinstance(e, BrokenProcessPool):
+                    _discard_executor(executor)
+                response, status = {"error": "Could not process file."}, 500
+            yield index, response, status
+    finally:
+        for future in futures:
+            future.cancel()
+        for _, src_path, _ in uploads:
+            try:
+                os.remove(src_path)
+            except FileNotFoundError:
+                pass
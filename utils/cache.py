@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from utils.metrics import cache_lookups
+
+
+def make_cache_key(*parts):
+    """
+    Build a stable cache key by hashing the JSON encoding of `parts`.
+    """
+    encoded = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Persistent key/value cache backed by a local SQLite file.
+
+    Entries older than `ttl` seconds are treated as misses. When the cache grows beyond
+    `max_entries`, the least recently used entries are evicted. Values must be
+    JSON-serializable.
+    """
+
+    def __init__(self, path, table="cache", ttl=None, max_entries=None):
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    @property
+    def _db(self):
+        """
+        The SQLite connection, opened (creating the file and table) on first use.
+        Callers must hold `self._lock`.
+        """
+        if self._conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_accessed_at ON {self.table} (accessed_at)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _is_expired(self, created_at, now):
+        return self.ttl is not None and now - created_at > self.ttl
+
+    def get(self, key, default=None):
+        """
+        Return the cached value for `key`, or `default` if it is missing or expired.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or self._is_expired(row[1], now):
+                self.misses += 1
+                cache_lookups.inc(cache=self.table, result="miss")
+                return default
+            self._db.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+            cache_lookups.inc(cache=self.table, result="hit")
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        """
+        Store `value` under `key`, evicting expired and least recently used entries as needed.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now):
+        if self.ttl is not None:
+            self._db.execute(f"DELETE FROM {self.table} WHERE created_at < ?", (now - self.ttl,))
+        if self.max_entries is not None:
+            count = self._db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+            if count > self.max_entries:
+                self._db.execute(
+                    f"DELETE FROM {self.table} WHERE key IN ("
+                    f"SELECT key FROM {self.table} ORDER BY accessed_at ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+
+    def clear(self):
+        """
+        Remove every entry and reset the hit/miss counters.
+        """
+        with self._lock:
+            self._db.execute(f"DELETE FROM {self.table}")
+            self._db.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        Return hit/miss counters and the current number of entries.
+        """
+        with self._lock:
+            size = self._db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "size": size}
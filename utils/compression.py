@@ -0,0 +1,63 @@
+import gzip
+import io
+import json
+import zlib
+
+def gunzip_limited(data, max_size):
+    """
+    Decompress a gzip body, refusing to inflate it beyond `max_size` bytes.
+    Raises ValueError for corrupt or oversized input.
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        body = decompressor.decompress(data, max_size + 1)
+    except zlib.error as e:
+        raise ValueError(f"Invalid gzip body: {e}")
+    if len(body) > max_size or decompressor.unconsumed_tail:
+        raise ValueError(f"Decompressed body exceeds {max_size} bytes.")
+    return body
+
+class GunzipRequestMiddleware:
+    """
+    WSGI middleware that inflates gzipped request bodies (Content-Encoding: gzip) before the
+    wrapped app sees them, replacing wsgi.input and CONTENT_LENGTH, so request.get_json() and
+    request.get_data() read the decompressed body. Bodies that are corrupt or would inflate beyond
+    `max_size` bytes are rejected with a 400 JSON error.
+    """
+
+    def __init__(self, app, max_size):
+        self.app = app
+        self.max_size = max_size
+
+    def __call__(self, environ, start_response):
+        if environ.get("HTTP_CONTENT_ENCODING", "").lower() != "gzip":
+            return self.app(environ, start_response)
+
+        try:
+            length = int(environ.get("CONTENT_LENGTH") or -1)
+        except ValueError:
+            length = -1
+        # Read at most one byte past the limit, so an oversized compressed body fails too
+        limit = self.max_size + 1 if length < 0 else min(length, self.max_size + 1)
+        try:
+            body = gunzip_limited(environ["wsgi.input"].read(limit), self.max_size)
+        except ValueError as e:
+            return self._error(start_response, str(e))
+
+        environ = dict(environ)
+        environ.pop("HTTP_CONTENT_ENCODING")
+        environ["wsgi.input"] = io.BytesIO(body)
+        environ["CONTENT_LENGTH"] = str(len(body))
+        return self.app(environ, start_response)
+
+    @staticmethod
+    def _error(start_response, message):
+        body = json.dumps({"error": message}).encode()
+        start_response("400 BAD REQUEST", [("Content-Type", "application/json"), ("Content-Length", str(len(body)))])
+        return [body]
+
+def gzip_body(data, compresslevel=5):
+    """
+    Gzip a response or request body.
+    """
+    return gzip.compress(data, compresslevel=compresslevel)
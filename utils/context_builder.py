@@ -0,0 +1,125 @@
+import logging
+import math
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Words too common to say anything about a result's relevance
+STOPWORDS = frozenset(
+    "a an and are as at be by for from get give has have in is it its of on or the this to what "
+    "which who with find extract return their them they information info".split()
+)
+
+WORD_PATTERN = re.compile(r"\w+")
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+def _get_encoding():
+    """
+    Load the tiktoken encoding once. Returns None if tiktoken or its encoding file is unavailable,
+    in which case token counts fall back to a character-based estimate.
+    """
+    global _encoding
+    with _encoding_lock:
+        if _encoding is None:
+            try:
+                import tiktoken
+                # cl100k_base is close to the Llama 3 tokenizer, which is also BPE-based
+                _encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                logger.info(f"tiktoken unavailable, estimating token counts: {e}")
+                _encoding = False
+        return _encoding or None
+
+def count_tokens(text):
+    """
+    Count the tokens in `text` with tiktoken, or estimate them at about 4 characters per token.
+    """
+    encoding = _get_encoding()
+    if encoding is None:
+        return math.ceil(len(text) / 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+def truncate_to_tokens(text, max_tokens):
+    """
+    Cut `text` down to at most `max_tokens` tokens.
+    """
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+
+def format_result(result):
+    """
+    Format one search result the way it is sent to the LLM.
+    """
+    # Organic results without a snippet are stored with "snippet": None
+    return f"Title: {result.get('title') or 'N/A'}\nSnippet: {result.get('snippet') or 'N/A'}"
+
+def format_snippet(result):
+    """
+    Format one search result for the {context} placeholder: the snippet only.
+    """
+    return result.get("snippet") or ""
+
+def _terms(text):
+    return {word for word in WORD_PATTERN.findall(text.casefold()) if word not in STOPWORDS}
+
+def dedupe_results(search_results):
+    """
+    Drop results whose snippet (or title, if there is no snippet) repeats an earlier one,
+    ignoring case and whitespace, as well as results with neither.
+    """
+    seen = set()
+    unique = []
+    for result in search_results:
+        text = result.get("snippet") or result.get("title") or ""
+        key = " ".join(text.split()).casefold()
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(result)
+    return unique
+
+def rank_results(search_results, entity, prompt):
+    """
+    Order results by relevance: entity terms found in the title or snippet count double,
+    prompt terms count once, and the search engine's own ranking breaks ties.
+    """
+    entity_terms = _terms(entity)
+    prompt_terms = _terms(prompt) - entity_terms
+
+    def score(indexed):
+        index, result = indexed
+        terms = _terms(f"{result.get('title') or ''} {result.get('snippet') or ''}")
+        return (-(2 * len(entity_terms & terms) + len(prompt_terms & terms) + 1 / (1 + index)), index)
+
+    return [result for _, result in sorted(enumerate(search_results), key=score)]
+
+def build_context(entity, prompt, search_results, token_budget, formatter=format_result):
+    """
+    Select the search results to send for one entity: duplicates removed, most relevant first,
+    and as many as fit in `token_budget` tokens once formatted with `formatter`. Results that do
+    not fit are skipped in favour of smaller, less relevant ones, except that the most relevant
+    result is truncated rather than dropped.
+
+    Returns:
+        list: The selected result dicts, in relevance order.
+    """
+    selected = []
+    used = 0
+    for result in rank_results(dedupe_results(search_results), entity, prompt):
+        # +1 for the newline that joins results
+        tokens = count_tokens(formatter(result)) + 1
+        if used + tokens > token_budget:
+            if selected or token_budget <= 0:
+                continue
+            result = {**result, "snippet": truncate_to_tokens(result.get("snippet") or "", token_budget // 2)}
+            tokens = count_tokens(formatter(result)) + 1
+        selected.append(result)
+        used += tokens
+
+    if len(selected) < len(search_results):
+        logger.debug(f"Context for '{entity}': kept {len(selected)} of {len(search_results)} results ({used} tokens)")
+    return selected
@@ -1,12 +1,15 @@
-from sqlalchemy import create_engine, Column, Integer, String, Table, MetaData
+import threading
+from datetime import datetime
+from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey, Table, MetaData, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from config.config import DATABASE_URI
 
-# SQLAlchemy setup
-engine = create_engine(DATABASE_URI)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# SQLAlchemy setup; the engine is created on first use, so importing the models needs no database
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
 Base = declarative_base()
+_engine = None
+_engine_lock = threading.Lock()
 
 # Define your table(s)
 class UploadedData(Base):
@@ -15,5 +18,106 @@ class UploadedData(Base):
     column_name = Column(String, index=True)
     preview_data = Column(String)
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+# Stored datasets; the rows themselves live in a Parquet file named after the dataset ID
+class Dataset(Base):
+    __tablename__ = 'datasets'
+    id = Column(String, primary_key=True)
+    source = Column(String)  # uploaded file name or sheet URL
+    columns = Column(Text, nullable=False)  # JSON list of column names
+    row_count = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+# Completed search/extraction runs; the ID is the results ID returned to clients
+class Run(Base):
+    __tablename__ = 'runs'
+    __table_args__ = (Index('ix_runs_dataset_type', 'dataset_id', 'run_type'),)
+    id = Column(String, primary_key=True)
+    run_type = Column(String, nullable=False)  # "search" or "extract"
+    dataset_id = Column(String)  # set when the entities were read from a stored dataset
+    prompt_template = Column(Text)
+    row_count = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+# One result per entity of a run, bulk-loaded when the run completes
+class RunResult(Base):
+    __tablename__ = 'run_results'
+    __table_args__ = (Index('ix_run_results_run_position', 'run_id', 'position'),)
+    id = Column(Integer, primary_key=True)
+    run_id = Column(String, nullable=False)
+    position = Column(Integer, nullable=False)
+    entity = Column(String, index=True)
+    result = Column(Text, nullable=False)  # JSON-encoded search results or extracted info
+
+# Background search/extraction runs
+class Job(Base):
+    __tablename__ = 'jobs'
+    id = Column(String, primary_key=True, index=True)
+    job_type = Column(String, nullable=False)  # "search" or "extract"
+    status = Column(String, nullable=False, index=True)  # pending, running, completed, cancelled, failed
+    payload = Column(Text, nullable=False)  # JSON request payload, minus the entity list
+    error = Column(Text)
+    owner = Column(String)  # worker that claimed the job while it runs
+    heartbeat_at = Column(DateTime)  # refreshed by the owner; a stale heartbeat means the owner died
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# Per-entity progress for a job, so a restarted worker skips completed entities
+class JobItem(Base):
+    __tablename__ = 'job_items'
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String, ForeignKey('jobs.id'), index=True, nullable=False)
+    position = Column(Integer, nullable=False)
+    entity = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="pending")  # pending or completed
+    result = Column(Text)  # JSON-encoded search results or extracted info
+
+# Write-back of values to a Google Sheet column, with progress so a failed write can resume
+class SheetWrite(Base):
+    __tablename__ = 'sheet_writes'
+    id = Column(String, primary_key=True, index=True)
+    sheet_url = Column(String, nullable=False)
+    column_name = Column(String, nullable=False)  # header of the target column
+    start_row = Column(Integer, nullable=False)  # data row of the first value
+    values = Column(Text, nullable=False)  # JSON list of values, one per row
+    rows_written = Column(Integer, nullable=False, default=0)
+    status = Column(String, nullable=False, index=True)  # pending, completed or failed
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# Last stored result per row of an incremental run, so a re-run only dispatches new or changed rows
+class RowResult(Base):
+    __tablename__ = 'row_results'
+    __table_args__ = (
+        UniqueConstraint('run_key', 'stage', 'row_key', name='uq_row_results_row'),
+        Index('ix_row_results_fingerprint', 'run_key', 'stage', 'fingerprint'),
+    )
+    id = Column(Integer, primary_key=True, index=True)
+    run_key = Column(String, nullable=False)  # client-chosen name for the run, e.g. sheet URL + column
+    stage = Column(String, nullable=False)  # "search" or "extract"
+    row_key = Column(Integer, nullable=False)  # row number within the source
+    fingerprint = Column(String(64), nullable=False)  # hash of the row's value and the prompt templates
+    result = Column(Text, nullable=False)  # JSON-encoded search results or extracted info
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+def get_engine():
+    """
+    Return the shared engine, creating it (and any missing tables) on first use.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                engine = create_engine(DATABASE_URI)
+                # Create tables
+                Base.metadata.create_all(bind=engine)
+                SessionLocal.configure(bind=engine)
+                _engine = engine
+    return _engine
+
+def get_session():
+    """
+    Open a new session on the shared engine.
+    """
+    get_engine()
+    return SessionLocal()
@@ -0,0 +1,123 @@
+import os
+import re
+import time
+import uuid
+from config.config import UPLOAD_FOLDER
+
+# pyarrow is imported inside the functions that use it, so the backend starts without loading it
+
+# Dataset and result IDs are generated with uuid4().hex; anything else is rejected
+ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+def new_dataset_id():
+    """
+    Return a new random dataset or results ID.
+    """
+    return uuid.uuid4().hex
+
+def _validate_id(value):
+    if not isinstance(value, str) or not ID_PATTERN.match(value):
+        raise KeyError(f"Unknown ID '{value}'.")
+    return value
+
+def dataset_path(dataset_id):
+    """
+    Return the Parquet file path for a dataset ID.
+    """
+    return os.path.join(UPLOAD_FOLDER, f"{_validate_id(dataset_id)}.parquet")
+
+def save_dataframe(df):
+    """
+    Persist a DataFrame as a new dataset and return its ID.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    dataset_id = new_dataset_id()
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), dataset_path(dataset_id))
+    return dataset_id
+
+def delete_dataset_files(dataset_ids=(), max_age_seconds=None):
+    """
+    Delete the Parquet files of `dataset_ids`, and any dataset file last modified more than
+    `max_age_seconds` ago (including files whose dataset was never registered).
+    Returns the IDs of the deleted files.
+    """
+    paths = {dataset_id: dataset_path(dataset_id) for dataset_id in dataset_ids}
+    if max_age_seconds is not None and os.path.isdir(UPLOAD_FOLDER):
+        cutoff = time.time() - max_age_seconds
+        for name in os.listdir(UPLOAD_FOLDER):
+            dataset_id, extension = os.path.splitext(name)
+            path = os.path.join(UPLOAD_FOLDER, name)
+            if extension == ".parquet" and ID_PATTERN.match(dataset_id) and os.path.getmtime(path) < cutoff:
+                paths[dataset_id] = path
+
+    deleted = []
+    for dataset_id, path in paths.items():
+        try:
+            os.remove(path)
+            deleted.append(dataset_id)
+        except FileNotFoundError:
+            pass
+    return deleted
+
+def _open_dataset(dataset_id):
+    import pyarrow.parquet as pq
+
+    path = dataset_path(dataset_id)
+    if not os.path.exists(path):
+        raise KeyError(f"Unknown dataset '{dataset_id}'.")
+    return pq.ParquetFile(path, memory_map=True)
+
+def dataset_info(dataset_id):
+    """
+    Return the column names and row count of a dataset without reading its rows.
+    """
+    parquet_file = _open_dataset(dataset_id)
+    return {"columns": parquet_file.schema_arrow.names, "row_count": parquet_file.metadata.num_rows}
+
+def read_table(dataset_id, start_row=0, end_row=None, columns=None):
+    """
+    Read rows [start_row, end_row) of a dataset as an Arrow table.
+    Only the Parquet row groups that overlap the window are read from the memory-mapped file.
+    """
+    parquet_file = _open_dataset(dataset_id)
+    missing = [column for column in columns or [] if column not in parquet_file.schema_arrow.names]
+    if missing:
+        raise KeyError(f"Unknown column(s) {missing} in dataset '{dataset_id}'.")
+    metadata = parquet_file.metadata
+    if end_row is None or end_row > metadata.num_rows:
+        end_row = metadata.num_rows
+    start_row = max(start_row, 0)
+
+    row_groups = []
+    first_row = None
+    offset = 0
+    for index in range(metadata.num_row_groups):
+        group_rows = metadata.row_group(index).num_rows
+        if offset < end_row and offset + group_rows > start_row:
+            row_groups.append(index)
+            if first_row is None:
+                first_row = offset
+        offset += group_rows
+
+    if not row_groups or start_row >= end_row:
+        names = columns or parquet_file.schema_arrow.names
+        return parquet_file.schema_arrow.empty_table().select(names)
+
+    table = parquet_file.read_row_groups(row_groups, columns=columns)
+    return table.slice(start_row - first_row, end_row - start_row)
+
+def read_rows(dataset_id, start_row=0, end_row=None, columns=None):
+    """
+    Read rows [start_row, end_row) of a dataset as a DataFrame.
+    """
+    return read_table(dataset_id, start_row, end_row, columns).to_pandas()
+
+def read_column_values(dataset_id, column, start_row=0, end_row=None):
+    """
+    Read one column of a dataset window as a list, with missing values as None.
+    """
+    series = read_rows(dataset_id, start_row, end_row, columns=[column])[column]
+    return series.astype(object).where(series.notna(), None).tolist()
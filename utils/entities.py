@@ -0,0 +1,61 @@
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+def normalize_entity(entity):
+    """
+    Return the key used to detect equivalent entities: the text with surrounding and repeated
+    whitespace removed, casefolded. Returns None for None, NaN and blank values.
+    """
+    if entity is None or (isinstance(entity, float) and math.isnan(entity)):
+        return None
+    key = " ".join(str(entity).split()).casefold()
+    if key in ("", "nan", "none"):
+        return None
+    return key
+
+def group_entities(entities):
+    """
+    Group entities that normalize to the same key.
+
+    Returns:
+        tuple: (dict of normalized key to the original entities in that group, in first-seen order,
+                list of blank entities, stats dict with "total", "unique", "blank" and "calls_saved").
+    """
+    groups = {}
+    blanks = []
+    for entity in entities:
+        key = normalize_entity(entity)
+        if key is None:
+            blanks.append(entity)
+        else:
+            groups.setdefault(key, []).append(entity)
+
+    stats = {
+        "total": len(entities),
+        "unique": len(groups),
+        "blank": len(blanks),
+        "calls_saved": len(entities) - len(groups),
+    }
+    return groups, blanks, stats
+
+def dedupe_entities(entities, label="entities"):
+    """
+    Collapse equivalent entities before making external calls.
+    Returns (representatives, fan_out, blanks): one representative (the first original spelling)
+    per group, a function mapping a (representative, value) result back to one pair per original
+    entity, and the blank entities, which callers should answer without an external call.
+    """
+    groups, blanks, stats = group_entities(entities)
+    if stats["calls_saved"]:
+        logger.info(
+            f"Deduplicated {label}: {stats['total']} rows, {stats['unique']} unique, "
+            f"{stats['blank']} blank, {stats['calls_saved']} calls saved"
+        )
+
+    def fan_out(representative, value):
+        return [(entity, value) for entity in groups[normalize_entity(representative)]]
+
+    representatives = [members[0] for members in groups.values()]
+    return representatives, fan_out, blanks
@@ -0,0 +1,182 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import logging
+from utils.entities import dedupe_entities
+from utils.context_builder import build_context, format_result, format_snippet
+from utils.groq_api import (
+    llm_rate_limiter, extract_information_with_groq, extract_batch_with_groq, extract_fields_with_groq,
+    async_extract_information_with_groq, async_extract_batch_with_groq, async_extract_fields_with_groq
+)
+from config.config import LLM_MAX_WORKERS, LLM_BATCH_SIZE, LLM_CONTEXT_TOKEN_BUDGET
+
+logger = logging.getLogger(__name__)
+
+def build_prompt(prompt_template, entity_str, entity_search_results):
+    """
+    Render the extraction prompt for one entity by filling the {entity} and {context} placeholders.
+    """
+    # Replace {entity} placeholder in the prompt with the current entity's name
+    prompt = prompt_template.replace("{entity}", entity_str)
+
+    # Prepare search result context (assuming "snippet" is available)
+    context = "\n".join(result.get("snippet") or "" for result in entity_search_results)
+
+    # Replace {context} placeholder in the prompt with the actual context
+    return prompt.replace("{context}", context)
+
+def format_extraction(extraction):
+    """
+    Convert an extraction result dict into the value returned to the client: a string, or a
+    dict of field values for structured extraction.
+    """
+    if "error" in extraction:
+        return f"Error: {extraction['error']}"
+    if "fields" in extraction:
+        return extraction["fields"]
+    return extraction.get("extracted_info", "No data found")
+
+def blank_answer(fields=None):
+    """
+    The answer given to blank entities without calling the LLM.
+    """
+    if fields:
+        return {field["name"]: None for field in fields}
+    return "No data found"
+
+def build_items(entities, search_results, prompt_template, token_budget=None):
+    """
+    Return an (entity string, rendered prompt, search results) tuple per entity.
+
+    Each entity's search results are deduplicated, ranked and packed into `token_budget` tokens.
+    If the entity's prompt has a {context} placeholder the packed snippets are rendered there and
+    the returned search results are empty, so the same text is not appended to the message again.
+    """
+    token_budget = LLM_CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+    items = []
+    for entity in entities:
+        # Ensure entity is a string for proper prompt replacement
+        entity_str = str(entity)
+        # Checked per entity: rows rendered from a multi-column template arrive as the entity,
+        # with the template "{entity}", and carry their own {context} placeholder
+        uses_context = "{context}" in prompt_template.replace("{entity}", entity_str)
+        entity_search_results = build_context(
+            entity_str, prompt_template, search_results.get(entity_str, []), token_budget,
+            formatter=format_snippet if uses_context else format_result,
+        )
+        prompt = build_prompt(prompt_template, entity_str, entity_search_results)
+        items.append((entity_str, prompt, [] if uses_context else entity_search_results))
+    return items
+
+def iter_extract_entities(entities, search_results, prompt_template, max_workers=None, batch_size=None, rate_limiter=None, fields=None):
+    """
+    Run LLM extraction for every entity using a bounded pool of concurrent calls, yielding
+    (entity, extracted string) pairs as each call completes.
+
+    With `batch_size` above 1, that many entities share one completion and the answers are
+    split back out per entity; entities the batch failed to answer are retried one at a time.
+    With a `fields` schema (see utils.field_schema), each entity gets one JSON-mode completion
+    answering every field, returned as a dict; batching does not apply.
+    Equivalent entities (same text up to case and whitespace) share one extraction, and blank
+    entities are answered without a call. Pending calls are cancelled if the caller stops
+    iterating early.
+    """
+    max_workers = max_workers or LLM_MAX_WORKERS
+    batch_size = 1 if fields else max(1, batch_size or LLM_BATCH_SIZE)
+    rate_limiter = rate_limiter or llm_rate_limiter
+
+    representatives, fan_out, blanks = dedupe_entities(entities, "extraction entities")
+    for entity in blanks:
+        yield str(entity), blank_answer(fields)
+    # Batched entities share one completion, so they share its context budget
+    items = build_items(representatives, search_results, prompt_template, LLM_CONTEXT_TOKEN_BUDGET // batch_size)
+
+    def extract_one(item):
+        _, prompt, entity_search_results = item
+        try:
+            if fields:
+                return format_extraction(extract_fields_with_groq(prompt, entity_search_results, fields, rate_limiter=rate_limiter))
+            return format_extraction(extract_information_with_groq(prompt, entity_search_results, rate_limiter=rate_limiter))
+        except Exception as e:
+            return f"Error: {str(e)}"
+
+    def extract_batch(batch):
+        if len(batch) == 1:
+            return [extract_one(batch[0])]
+        extractions = extract_batch_with_groq(
+            [(prompt, results) for _, prompt, results in batch], rate_limiter=rate_limiter
+        )
+        answers = []
+        for item, extraction in zip(batch, extractions):
+            if "error" in extraction:
+                logger.info(f"Batch extraction missed '{item[0]}', retrying individually: {extraction['error']}")
+                answers.append(extract_one(item))
+            else:
+                answers.append(format_extraction(extraction))
+        return answers
+
+    batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {executor.submit(extract_batch, batch): batch for batch in batches}
+        for future in as_completed(futures):
+            for (entity_str, _, _), answer in zip(futures[future], future.result()):
+                for entity, value in fan_out(entity_str, answer):
+                    yield str(entity), value
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def extract_entities(entities, search_results, prompt_template, max_workers=None, batch_size=None, rate_limiter=None, fields=None):
+    """
+    Run LLM extraction for every entity concurrently.
+    Returns a dict of extracted strings (or field dicts) keyed by entity, in the same order as `entities`.
+    """
+    completed = dict(iter_extract_entities(entities, search_results, prompt_template, max_workers, batch_size, rate_limiter, fields))
+    return {str(entity): completed[str(entity)] for entity in entities}
+
+async def async_iter_extract_entities(entities, search_results, prompt_template, max_in_flight=None, batch_size=None, rate_limiter=None, fields=None):
+    """
+    Async version of `iter_extract_entities` that runs on the event loop.
+    At most `max_in_flight` completions wait on Groq at once.
+    """
+    semaphore = asyncio.Semaphore(max_in_flight or LLM_MAX_WORKERS)
+    batch_size = 1 if fields else max(1, batch_size or LLM_BATCH_SIZE)
+    rate_limiter = rate_limiter or llm_rate_limiter
+    representatives, fan_out, blanks = dedupe_entities(entities, "extraction entities")
+    for entity in blanks:
+        yield str(entity), blank_answer(fields)
+    # Batched entities share one completion, so they share its context budget
+    items = build_items(representatives, search_results, prompt_template, LLM_CONTEXT_TOKEN_BUDGET // batch_size)
+
+    async def extract_one(item):
+        _, prompt, entity_search_results = item
+        if fields:
+            return format_extraction(await async_extract_fields_with_groq(prompt, entity_search_results, fields, rate_limiter=rate_limiter))
+        return format_extraction(await async_extract_information_with_groq(prompt, entity_search_results, rate_limiter=rate_limiter))
+
+    async def extract_batch(batch):
+        async with semaphore:
+            if len(batch) == 1:
+                answers = [await extract_one(batch[0])]
+            else:
+                extractions = await async_extract_batch_with_groq(
+                    [(prompt, results) for _, prompt, results in batch], rate_limiter=rate_limiter
+                )
+                answers = []
+                for item, extraction in zip(batch, extractions):
+                    if "error" in extraction:
+                        logger.info(f"Batch extraction missed '{item[0]}', retrying individually: {extraction['error']}")
+                        answers.append(await extract_one(item))
+                    else:
+                        answers.append(format_extraction(extraction))
+        return [(entity_str, answer) for (entity_str, _, _), answer in zip(batch, answers)]
+
+    batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+    tasks = [asyncio.ensure_future(extract_batch(batch)) for batch in batches]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            for entity_str, answer in await next_done:
+                for entity, value in fan_out(entity_str, answer):
+                    yield str(entity), value
+    finally:
+        for task in tasks:
+            task.cancel()
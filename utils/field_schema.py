@@ -0,0 +1,114 @@
+import math
+import re
+
+FIELD_TYPES = ("string", "number", "boolean", "list")
+# Field names become JSON keys and CSV column names
+FIELD_NAME_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_ -]{0,63}$")
+
+def parse_fields(spec):
+    """
+    Validate a structured extraction schema and return it as a list of field dicts with
+    "name", "description", "type" and "pattern" keys.
+
+    `spec` is a list whose items are field names or dicts with "name" and optional
+    "description", "type" (one of FIELD_TYPES, default "string") and "pattern" (a regular
+    expression string values must match, e.g. for emails). Raises ValueError if it is invalid.
+    """
+    if not isinstance(spec, list) or not spec:
+        raise ValueError("'fields' must be a non-empty list.")
+
+    fields = []
+    for item in spec:
+        field = {"name": item} if isinstance(item, str) else item
+        if not isinstance(field, dict) or not isinstance(field.get("name"), str):
+            raise ValueError("Each field must be a name or an object with a 'name'.")
+        name = field["name"].strip()
+        if not FIELD_NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid field name '{name}'.")
+        if any(existing["name"] == name for existing in fields):
+            raise ValueError(f"Duplicate field '{name}'.")
+        field_type = field.get("type", "string")
+        if field_type not in FIELD_TYPES:
+            raise ValueError(f"Field '{name}' has unknown type '{field_type}'. Expected one of {FIELD_TYPES}.")
+        pattern = field.get("pattern")
+        if pattern is not None:
+            try:
+                re.compile(pattern)
+            except (re.error, TypeError) as e:
+                raise ValueError(f"Field '{name}' has an invalid pattern: {e}")
+        fields.append({
+            "name": name,
+            "description": str(field.get("description") or ""),
+            "type": field_type,
+            "pattern": pattern,
+        })
+    return fields
+
+def _coerce(field, value):
+    field_type = field["type"]
+    if field_type == "number":
+        if isinstance(value, bool):
+            raise ValueError("expected a number")
+        if isinstance(value, int) or (isinstance(value, float) and math.isfinite(value)):
+            return value
+        number = float(str(value).replace(",", "").strip())
+        if not math.isfinite(number):
+            raise ValueError("expected a number")
+        return int(number) if number.is_integer() else number
+    if field_type == "boolean":
+        if isinstance(value, bool):
+            return value
+        text = str(value).strip().lower()
+        if text in ("true", "yes"):
+            return True
+        if text in ("false", "no"):
+            return False
+        raise ValueError("expected true or false")
+    if field_type == "list":
+        values = value if isinstance(value, list) else [value]
+        if any(isinstance(item, (dict, list)) for item in values):
+            raise ValueError("expected a list of values")
+        return [str(item).strip() for item in values if item is not None and str(item).strip()]
+    if isinstance(value, (dict, list)):
+        raise ValueError("expected a single value")
+    return str(value).strip()
+
+def validate_value(field, value):
+    """
+    Coerce one answered value to its field's type.
+    Returns (value, None) on success, with None meaning "not found", or (None, error message).
+    """
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None, None
+    try:
+        value = _coerce(field, value)
+    except ValueError as e:
+        return None, str(e)
+
+    pattern = field["pattern"]
+    if pattern:
+        candidates = value if isinstance(value, list) else [value]
+        if not all(re.fullmatch(pattern, str(candidate)) for candidate in candidates):
+            return None, f"does not match pattern {pattern}"
+    return value, None
+
+def parse_answer(answer, fields):
+    """
+    Validate a parsed JSON answer against `fields`.
+    Returns ({field name: value} for the valid fields, {field name: error} for the rest).
+    Fields missing from the answer count as failed, so they can be asked for again.
+    """
+    values = {}
+    errors = {}
+    if not isinstance(answer, dict):
+        return values, {field["name"]: "answer is not a JSON object" for field in fields}
+    for field in fields:
+        if field["name"] not in answer:
+            errors[field["name"]] = "missing from the answer"
+            continue
+        value, error = validate_value(field, answer[field["name"]])
+        if error is None:
+            values[field["name"]] = value
+        else:
+            errors[field["name"]] = error
+    return values, errors
@@ -1,9 +1,115 @@
-import pandas as pd
 from flask import jsonify
+from config.config import CSV_CHUNK_SIZE, CSV_SCHEMA_SAMPLE_ROWS
+
+# pandas and pyarrow are imported inside the functions that use them, so the backend starts
+# without loading them
 
 def process_csv(file_path):
+    import pandas as pd
+
     try:
         df = pd.read_csv(file_path)
         return {"columns": df.columns.tolist(), "preview": df.head(5).to_dict(orient="records")}, 200
     except Exception as e:
         return {"error": "Invalid CSV file."}, 400
+
+def infer_csv_dtypes(sample):
+    """
+    Infer column dtypes from a sample of rows, using nullable dtypes so that missing values
+    in later chunks do not change a column's type.
+    """
+    import pandas as pd
+
+    dtypes = {}
+    for column, dtype in sample.dtypes.items():
+        if pd.api.types.is_bool_dtype(dtype):
+            dtypes[column] = "boolean"
+        elif pd.api.types.is_integer_dtype(dtype):
+            dtypes[column] = "Int64"
+        elif pd.api.types.is_float_dtype(dtype):
+            dtypes[column] = "float64"
+        else:
+            dtypes[column] = "string"
+    return dtypes
+
+def records_for_json(df):
+    """
+    Convert a DataFrame to JSON-safe records, with missing values as None.
+    """
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+def _write_csv_chunks(file, dest_path, dtype, start_row, stop_row, chunksize):
+    """
+    Stream the CSV into a Parquet file chunk by chunk, keeping only the rows in
+    [start_row, stop_row) in memory. Returns (columns, window rows, total row count).
+    """
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    file.seek(0)
+    writer = None
+    window_chunks = []
+    row_count = 0
+    try:
+        for chunk in pd.read_csv(file, dtype=dtype, chunksize=chunksize):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(dest_path, table.schema)
+            writer.write_table(table.cast(writer.schema))
+
+            # Keep the part of this chunk that falls inside the requested window
+            chunk_start = max(start_row - row_count, 0)
+            chunk_stop = len(chunk) if stop_row is None else min(stop_row - row_count, len(chunk))
+            if chunk_start < chunk_stop:
+                window_chunks.append(chunk.iloc[chunk_start:chunk_stop])
+            row_count += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    columns = list(dtype)
+    window = pd.concat(window_chunks) if window_chunks else pd.DataFrame(columns=columns)
+    return columns, window, row_count
+
+def ingest_csv(file, dest_path, start_row=0, end_row=None, preview_rows=5, chunksize=None):
+    """
+    Parse a CSV upload in bounded-size chunks and store it as a Parquet file at `dest_path`.
+
+    Column types are inferred from the first CSV_SCHEMA_SAMPLE_ROWS rows. If a later chunk
+    does not fit that schema, the file is re-read with every column as a string. Only the
+    first `preview_rows` rows of the [start_row, end_row) window are kept in memory.
+
+    Returns:
+        tuple: (response dict with "columns", "preview" and "row_count", HTTP status code).
+    """
+    import pandas as pd
+    import pyarrow as pa
+
+    chunksize = chunksize or CSV_CHUNK_SIZE
+    stop_row = start_row + preview_rows
+    if end_row is not None:
+        stop_row = min(stop_row, end_row)
+
+    try:
+        sample = pd.read_csv(file, nrows=CSV_SCHEMA_SAMPLE_ROWS)
+        try:
+            columns, window, row_count = _write_csv_chunks(
+                file, dest_path, infer_csv_dtypes(sample), start_row, stop_row, chunksize
+            )
+        except (ValueError, TypeError, pa.ArrowException):
+            # A value later in the file did not match the sampled types
+            dtype = {column: "string" for column in sample.columns}
+            columns, window, row_count = _write_csv_chunks(file, dest_path, dtype, start_row, stop_row, chunksize)
+    except Exception as e:
+        return {"error": "Invalid CSV file."}, 400
+
+    return {"columns": columns, "preview": records_for_json(window), "row_count": row_count}, 200
+
+def ingest_csv_file(src_path, dest_path, start_row=0, end_row=None, preview_rows=5):
+    """
+    Like `ingest_csv`, for a CSV file on disk. Takes only picklable arguments so it can run
+    in a worker process.
+    """
+    with open(src_path, "rb") as file:
+        return ingest_csv(file, dest_path, start_row=start_row, end_row=end_row, preview_rows=preview_rows)
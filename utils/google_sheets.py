@@ -1,32 +1,240 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
 from flask import jsonify
-import pandas as pd
-import gspread
-from google.oauth2 import service_account
-from config.config import GOOGLE_SHEETS_API_KEY
+from utils.metrics import span, cache_lookups, retries
+from utils.rate_limiter import TokenBucket, jittered_backoff
+from config.config import (
+    GOOGLE_SHEETS_API_KEY, SHEETS_PAGE_SIZE, SHEETS_CACHE_MAX_ENTRIES, SHEETS_WRITE_BATCH_ROWS,
+    SHEETS_WRITE_RATE_LIMIT, SHEETS_WRITE_MAX_RETRIES, SHEETS_WRITE_BACKOFF_BASE
+)
+
+logger = logging.getLogger(__name__)
+
+# Define Google Sheets API scope. The Drive metadata scope lets previews read a sheet's last
+# modified time for caching.
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive.metadata.readonly",
+]
+
+_client = None
+_client_lock = threading.Lock()
+
+# Shared pacing for write calls, which have a per-user quota of 60 per minute
+sheets_write_limiter = TokenBucket(SHEETS_WRITE_RATE_LIMIT, 1, name="sheets_write")
+
+# Status codes worth retrying: quota exceeded and transient server errors
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# In-memory cache of fetched row windows, keyed by sheet ID, revision and row range
+_sheet_cache = OrderedDict()
+_sheet_cache_lock = threading.Lock()
+
+def get_sheets_client():
+    """
+    Return the shared authorized gspread client, creating it on first use.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            if not GOOGLE_SHEETS_API_KEY:
+                raise RuntimeError("GOOGLE_SHEETS_API_KEY is not set.")
+            # Imported here so the backend starts without loading the Google client libraries
+            import gspread
+            from google.oauth2 import service_account
+
+            # Authenticate using Google Sheets API credentials
+            credentials = service_account.Credentials.from_service_account_info(
+                json.loads(GOOGLE_SHEETS_API_KEY), scopes=SCOPES
+            )
+            _client = gspread.authorize(credentials)
+        return _client
+
+def get_sheet_revision(spreadsheet):
+    """
+    Return the spreadsheet's last modified time, used to invalidate cached contents, or None
+    if the Drive API cannot be reached (not enabled, or the key lacks the Drive scope).
+    """
+    import gspread
 
-def connect_google_sheet(sheet_url, start_row=0, end_row=None):
     try:
-        # Define Google Sheets API scope
-        scopes = ["https://www.googleapis.com/auth/spreadsheets"]
-        
-        # Authenticate using Google Sheets API credentials
-        credentials = service_account.Credentials.from_service_account_info(
-            GOOGLE_SHEETS_API_KEY, scopes=scopes
-        )
-        client = gspread.authorize(credentials)
-        
-        # Access the first sheet by URL
-        sheet = client.open_by_url(sheet_url).sheet1
-        rows = sheet.get_all_values()
-        
-        # Convert sheet data into a DataFrame
-        df = pd.DataFrame(rows[1:], columns=rows[0])  # Assuming the first row is the header
-        
-        # Apply row slicing
-        if end_row is not None:
-            df = df.iloc[start_row:end_row]
+        # Read from the Drive API (files.get), not the Sheets API
+        return spreadsheet.get_lastUpdateTime()
+    except gspread.exceptions.APIError as e:
+        logger.warning(f"Could not read the sheet's last modified time, fetching without cache: {e}")
+        return None
+
+def iter_sheet_pages(worksheet, start_row=0, end_row=None, page_size=None):
+    """
+    Yield lists of data rows (excluding the header) in pages of at most `page_size` rows.
+    Row numbers are 0-based data rows, so data row 0 is sheet row 2. Rows are read until
+    `end_row` (exclusive) or the end of the sheet.
+    """
+    page_size = page_size or SHEETS_PAGE_SIZE
+    last_row = worksheet.row_count - 1  # Last data row index
+    if end_row is not None:
+        last_row = min(last_row, end_row - 1)
+
+    page_start = start_row
+    while page_start <= last_row:
+        page_end = min(page_start + page_size - 1, last_row)
+        rows = worksheet.get(f"{page_start + 2}:{page_end + 2}")
+        if not rows:
+            break
+        yield rows
+        if len(rows) < page_end - page_start + 1:
+            break  # Fewer rows than requested means the rest of the sheet is empty
+        page_start = page_end + 1
+
+def _cache_get(key):
+    with _sheet_cache_lock:
+        if key in _sheet_cache:
+            _sheet_cache.move_to_end(key)
+            return _sheet_cache[key]
+    return None
+
+def _cache_set(key, df):
+    with _sheet_cache_lock:
+        _sheet_cache[key] = df
+        _sheet_cache.move_to_end(key)
+        while len(_sheet_cache) > SHEETS_CACHE_MAX_ENTRIES:
+            _sheet_cache.popitem(last=False)
+
+def unique_headers(header):
+    """
+    Make sheet headers usable as column names the way pd.read_csv does for CSV uploads: blank
+    headers become "Unnamed: <index>" and repeats become "name.1", "name.2", ... Parquet (and
+    so dataset storage) rejects duplicate column names.
+    """
+    names = [str(name) if str(name).strip() else f"Unnamed: {index}" for index, name in enumerate(header)]
+    taken = set(names)
+    counts = {}
+    unique = []
+    for name in names:
+        count = counts.get(name, 0)
+        if count:
+            while f"{name}.{count}" in taken:
+                count += 1
+            taken.add(f"{name}.{count}")
+            unique.append(f"{name}.{count}")
         else:
-            df = df.iloc[start_row:]
+            unique.append(name)
+        counts[name] = count + 1
+    return unique
+
+def fetch_sheet_dataframe(sheet_url, start_row=0, end_row=None):
+    """
+    Fetch the header and data rows [start_row, end_row) of the first worksheet as a DataFrame.
+
+    Only the requested row range is downloaded. Results are cached by spreadsheet ID,
+    revision and row range, so repeated previews of an unchanged sheet skip the download.
+    Without a revision the sheet is always downloaded.
+    """
+    import pandas as pd
+
+    spreadsheet = get_sheets_client().open_by_url(sheet_url)
+    revision = get_sheet_revision(spreadsheet)
+    cache_key = (spreadsheet.id, revision, start_row, end_row)
+    if revision is not None:
+        cached = _cache_get(cache_key)
+        if cached is not None:
+            cache_lookups.inc(cache="sheets", result="hit")
+            return cached.copy()
+    cache_lookups.inc(cache="sheets", result="miss")
+
+    worksheet = spreadsheet.sheet1
+    with span("sheets_fetch"):
+        header = worksheet.row_values(1)  # Assuming the first row is the header
+        rows = []
+        for page in iter_sheet_pages(worksheet, start_row, end_row):
+            rows.extend(page)
+
+    # The API trims trailing empty cells, so pad each row to the header width
+    rows = [row[:len(header)] + [""] * (len(header) - len(row)) for row in rows]
+    df = pd.DataFrame(rows, columns=unique_headers(header))
+    if revision is not None:
+        _cache_set(cache_key, df)
+    return df.copy()
+
+def _batch_update(worksheet, data):
+    """
+    Send one values batch update, retrying throttled and transient errors with backoff.
+    """
+    import gspread
+
+    for attempt in range(SHEETS_WRITE_MAX_RETRIES + 1):
+        sheets_write_limiter.acquire()
+        try:
+            with span("sheets_write"):
+                # RAW keeps extracted text that starts with '=' from being evaluated as a formula
+                return worksheet.batch_update(data, value_input_option="RAW")
+        except gspread.exceptions.APIError as e:
+            status_code = e.response.status_code
+            if status_code not in RETRYABLE_STATUS_CODES or attempt == SHEETS_WRITE_MAX_RETRIES:
+                raise
+            retries.inc(provider="sheets", reason="throttled" if status_code == 429 else "transient")
+            delay = jittered_backoff(attempt, SHEETS_WRITE_BACKOFF_BASE)
+            logger.warning(f"Sheets write failed with {status_code}, retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+def write_column_values(sheet_url, column, values, start_row=0, offset=0, on_progress=None, batch_rows=None):
+    """
+    Write `values` down the column with header `column` of the first worksheet, one value per
+    data row from `start_row` (0-based data rows, like `iter_sheet_pages`). The column is added
+    after the last header if it does not exist. None values leave their cell unchanged.
+
+    Values are sent as contiguous ranges of `batch_rows` rows, one batch update per range, so
+    thousands of rows take a few API calls. Writing starts at `offset` into `values`, which lets
+    a failed write resume where it stopped; `on_progress(rows_written)` is called after each
+    successful call with the new offset.
+
+    Returns:
+        int: The number of batch update calls made.
+    """
+    from gspread.utils import rowcol_to_a1
+
+    batch_rows = batch_rows or SHEETS_WRITE_BATCH_ROWS
+    worksheet = get_sheets_client().open_by_url(sheet_url).sheet1
+    header = worksheet.row_values(1)
+
+    pending = []
+    if column in header:
+        column_index = header.index(column) + 1
+    else:
+        column_index = len(header) + 1
+        if column_index > worksheet.col_count:
+            worksheet.add_cols(column_index - worksheet.col_count)
+        pending.append({"range": rowcol_to_a1(1, column_index), "values": [[column]]})
+    last_row = start_row + len(values) + 1  # Sheet row of the last value
+    if last_row > worksheet.row_count:
+        worksheet.add_rows(last_row - worksheet.row_count)
+
+    calls = 0
+    while offset < len(values) or pending:
+        chunk = values[offset:offset + batch_rows]
+        if chunk:
+            first_row = start_row + offset + 2
+            pending.append({
+                "range": f"{rowcol_to_a1(first_row, column_index)}:{rowcol_to_a1(first_row + len(chunk) - 1, column_index)}",
+                "values": [[value] for value in chunk],
+            })
+        _batch_update(worksheet, pending)
+        calls += 1
+        pending = []
+        offset += len(chunk)
+        if on_progress is not None:
+            on_progress(offset)
+    return calls
+
+def connect_google_sheet(sheet_url, start_row=0, end_row=None):
+    import gspread
+
+    try:
+        # Fetch only the requested rows of the first sheet
+        df = fetch_sheet_dataframe(sheet_url, start_row, end_row)
         
         # Prepare JSON response
         response = {
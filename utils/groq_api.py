@@ -1,53 +1,381 @@
 import os
-from groq import Groq
+import asyncio
+import json
+import logging
+import threading
+import time
+from contextlib import nullcontext
+from utils.cache import ResultCache, make_cache_key
+from utils.context_builder import format_result
+from utils.rate_limiter import AdaptiveLimiter, jittered_backoff, parse_duration
+from utils.metrics import span, retries, log_payload
+from utils.field_schema import parse_answer
+from config.config import (
+    LLM_MODEL, LLM_MAX_RETRIES, LLM_BACKOFF_BASE, LLM_RATE_LIMIT, LLM_BURST, LLM_MAX_WORKERS,
+    CACHE_FOLDER, LLM_CACHE_TTL, LLM_CACHE_MAX_ENTRIES
+)
 
-# Initialize the Groq client using the API key from environment variables
-api_key = os.environ.get("GROQ_API_KEY")
-print(f"Initializing Groq client with API key: {api_key}")  # Debugging initialization
-client = Groq(api_key=api_key)
+logger = logging.getLogger(__name__)
 
-def extract_information_with_groq(prompt, search_results):
+# Groq clients, created on first use so importing this module does not load the SDK
+client = None
+# Used by the async (ASGI) serving mode
+async_client = None
+_client_lock = threading.Lock()
+
+# On-disk cache of completions, keyed by model, rendered messages and generation params
+llm_cache = ResultCache(
+    os.path.join(CACHE_FOLDER, "llm_cache.sqlite3"),
+    table="completions",
+    ttl=LLM_CACHE_TTL,
+    max_entries=LLM_CACHE_MAX_ENTRIES,
+)
+
+# Shared across requests so concurrent extractions stay within the Groq rate limit;
+# backs off on 429s and exhausted quota headers, and recovers toward the configured rate
+llm_rate_limiter = AdaptiveLimiter("groq", LLM_RATE_LIMIT, LLM_BURST, LLM_MAX_WORKERS)
+
+def get_client():
+    """
+    Return the shared Groq client, creating it on first use.
+    """
+    global client
+    with _client_lock:
+        if client is None:
+            from groq import Groq
+            # Retries are handled by create_chat_completion so rate limits and backoff are applied in one place
+            client = Groq(api_key=os.environ.get("GROQ_API_KEY"), max_retries=0)
+        return client
+
+def get_async_client():
+    """
+    Return the shared AsyncGroq client, creating it on first use.
+    """
+    global async_client
+    with _client_lock:
+        if async_client is None:
+            from groq import AsyncGroq
+            async_client = AsyncGroq(api_key=os.environ.get("GROQ_API_KEY"), max_retries=0)
+        return async_client
+
+def retryable_errors():
+    """
+    Errors worth retrying: rate limits, timeouts, dropped connections and 5xx responses.
+    """
+    from groq import RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
+    return (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+def _retry_after_seconds(error):
+    """
+    Return the Retry-After delay requested by the API, if the error carries one.
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    return parse_duration(response.headers.get("retry-after"))
+
+def _retry_delay(error, attempt, rate_limiter=None):
+    """
+    Record a retryable error and return how long this caller should wait before retry
+    number `attempt`. Rate limits are handed to `rate_limiter`, which slows down and pauses
+    every caller; otherwise the Retry-After value or jittered exponential backoff is used.
+    """
+    from groq import RateLimitError
+
+    retries.inc(provider="groq", reason=type(error).__name__)
+    retry_after = _retry_after_seconds(error)
+    if isinstance(error, RateLimitError) and rate_limiter is not None:
+        rate_limiter.record_throttle(retry_after)
+        return 0.0
+    if retry_after is not None:
+        return retry_after
+    return jittered_backoff(attempt, LLM_BACKOFF_BASE)
+
+def _record_response(rate_limiter, headers):
+    if rate_limiter is not None:
+        rate_limiter.update_from_headers(headers)
+        rate_limiter.record_success()
+
+def create_chat_completion(messages, model=LLM_MODEL, rate_limiter=None, **params):
+    """
+    Create a chat completion, retrying transient failures with jittered exponential backoff.
+    Each attempt waits on `rate_limiter`, which adapts to 429s, Retry-After and the
+    x-ratelimit-* headers of every response.
+    """
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            with rate_limiter.slot() if rate_limiter is not None else nullcontext():
+                with span("llm_call"):
+                    response = get_client().chat.completions.with_raw_response.create(messages=messages, model=model, **params)
+            _record_response(rate_limiter, response.headers)
+            return response.parse()
+        except retryable_errors() as e:
+            if attempt == LLM_MAX_RETRIES:
+                raise
+            time.sleep(_retry_delay(e, attempt, rate_limiter))
+
+async def async_create_chat_completion(messages, model=LLM_MODEL, rate_limiter=None, **params):
+    """
+    Async version of `create_chat_completion` using the AsyncGroq client.
+    """
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            async with rate_limiter.slot_async() if rate_limiter is not None else nullcontext():
+                with span("llm_call"):
+                    response = await get_async_client().chat.completions.with_raw_response.create(messages=messages, model=model, **params)
+            _record_response(rate_limiter, response.headers)
+            return await response.parse()
+        except retryable_errors() as e:
+            if attempt == LLM_MAX_RETRIES:
+                raise
+            await asyncio.sleep(_retry_delay(e, attempt, rate_limiter))
+
+def complete_chat(messages, model=LLM_MODEL, rate_limiter=None, **params):
+    """
+    Return the message content of a chat completion, memoized in `llm_cache`.
+
+    Identical requests (same model, messages and generation params) are answered from the
+    cache without calling Groq or waiting on `rate_limiter`.
+    """
+    cache_key = make_cache_key(model, messages, params)
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    chat_completion = create_chat_completion(messages, model=model, rate_limiter=rate_limiter, **params)
+    content = chat_completion.choices[0].message.content
+    llm_cache.set(cache_key, content)
+    return content
+
+async def async_complete_chat(messages, model=LLM_MODEL, rate_limiter=None, **params):
+    """
+    Async version of `complete_chat`, sharing the same completion cache.
+    Cache reads and writes hit SQLite, so they run in worker threads off the event loop.
+    """
+    cache_key = make_cache_key(model, messages, params)
+    cached = await asyncio.to_thread(llm_cache.get, cache_key)
+    if cached is not None:
+        return cached
+
+    chat_completion = await async_create_chat_completion(messages, model=model, rate_limiter=rate_limiter, **params)
+    content = chat_completion.choices[0].message.content
+    await asyncio.to_thread(llm_cache.set, cache_key, content)
+    return content
+
+def format_search_results(search_results):
+    """
+    Format each search result as a string and join them with newlines.
+    """
+    return "\n".join(format_result(result) for result in search_results)
+
+def build_message(prompt, search_results):
+    """
+    Combine the prompt and formatted search results into the message content.
+    Results already rendered into the prompt via {context} are passed as an empty list.
+    """
+    formatted_results = format_search_results(search_results)
+    return f"{prompt}\n\n{formatted_results}" if formatted_results else prompt
+
+def extract_information_with_groq(prompt, search_results, rate_limiter=None):
     """
     Send search results to Groq's API to extract specific information based on the prompt.
     
     Args:
         prompt (str): The prompt describing the information to extract.
         search_results (list): List of search result dictionaries to analyze.
+        rate_limiter (AdaptiveLimiter, optional): Limiter to wait on before calling the API.
 
     Returns:
         dict: The response containing the extracted information or an error message.
     """
     try:
-        print("Received prompt:", prompt)  # Debugging prompt input
-        print("Received search results:", search_results)  # Debugging search results input
-        
-        # Format each search result as a string and join them with newlines
-        formatted_results = "\n".join(
-            f"Title: {result.get('title', 'N/A')}\nSnippet: {result.get('snippet', 'N/A')}"
-            for result in search_results
-        )
-        print("Formatted search results for LLM:", formatted_results)  # Debugging formatted results
-
         # Combine the prompt and formatted search results into the message content
-        message_content = f"{prompt}\n\n{formatted_results}"
-        print("Message content sent to LLM:", message_content)  # Debugging message content
+        message_content = build_message(prompt, search_results)
+        # Debug: log the message for a sample of calls
+        log_payload(logger, "Message content sent to LLM: %s", message_content)
 
-        # Create a chat completion request
-        chat_completion = client.chat.completions.create(
+        # Create a chat completion request (served from the cache when unchanged)
+        extracted_info = complete_chat(
             messages=[
                 {
                     "role": "user",
                     "content": message_content,
                 }
             ],
-            model="llama3-8b-8192",
+            rate_limiter=rate_limiter,
         )
-        print("API response from LLM:", chat_completion)  # Debugging full API response
+        log_payload(logger, "Extracted information from LLM: %s", extracted_info)
+        return {"extracted_info": extracted_info}
+    except Exception as e:
+        logger.error(f"Error during LLM extraction: {e}")
+        return {"error": str(e)}
 
-        # Extract the LLM's response from the chat completion result
-        extracted_info = chat_completion.choices[0].message.content
-        print("Extracted information from LLM:", extracted_info)  # Debugging extracted information
+async def async_extract_information_with_groq(prompt, search_results, rate_limiter=None):
+    """
+    Async version of `extract_information_with_groq`.
+    """
+    message_content = build_message(prompt, search_results)
+    try:
+        extracted_info = await async_complete_chat(
+            messages=[{"role": "user", "content": message_content}],
+            rate_limiter=rate_limiter,
+        )
         return {"extracted_info": extracted_info}
     except Exception as e:
-        print("Error during LLM extraction:", e)  # Debugging error
         return {"error": str(e)}
+
+def build_batch_message(items):
+    """
+    Build one message asking for a JSON object with an answer per numbered (prompt, search_results) item.
+    """
+    sections = []
+    for index, (prompt, search_results) in enumerate(items, start=1):
+        section = f"### Item {index}\nRequest: {prompt}"
+        if search_results:
+            section += f"\nSearch results:\n{format_search_results(search_results)}"
+        sections.append(section)
+    return (
+        "Answer each numbered request below using only its own search results. "
+        "Respond with a JSON object that maps each item number (as a string) to the answer text.\n\n"
+        + "\n\n".join(sections)
+    )
+
+def split_batch_answers(content, count):
+    """
+    Split a batched JSON answer back into one result dict per item.
+    Items the model did not answer get an "error" key.
+    """
+    answers = json.loads(content)
+    results = []
+    for index in range(1, count + 1):
+        answer = answers.get(str(index)) if isinstance(answers, dict) else None
+        if answer is None:
+            results.append({"error": f"No answer returned for item {index}."})
+        else:
+            results.append({"extracted_info": answer if isinstance(answer, str) else json.dumps(answer)})
+    return results
+
+def extract_batch_with_groq(items, rate_limiter=None):
+    """
+    Extract information for several entities in a single chat completion.
+
+    Args:
+        items (list): (prompt, search_results) pairs, one per entity.
+        rate_limiter (AdaptiveLimiter, optional): Limiter to wait on before calling the API.
+
+    Returns:
+        list: One result dict per item, in the same order, shaped like the return value of
+        `extract_information_with_groq`. Items the model did not answer get an "error" key.
+    """
+    try:
+        content = complete_chat(
+            messages=[{"role": "user", "content": build_batch_message(items)}],
+            rate_limiter=rate_limiter,
+            response_format={"type": "json_object"},
+        )
+        return split_batch_answers(content, len(items))
+    except Exception as e:
+        return [{"error": str(e)} for _ in items]
+
+async def async_extract_batch_with_groq(items, rate_limiter=None):
+    """
+    Async version of `extract_batch_with_groq`.
+    """
+    try:
+        content = await async_complete_chat(
+            messages=[{"role": "user", "content": build_batch_message(items)}],
+            rate_limiter=rate_limiter,
+            response_format={"type": "json_object"},
+        )
+        return split_batch_answers(content, len(items))
+    except Exception as e:
+        return [{"error": str(e)} for _ in items]
+
+def build_fields_message(prompt, search_results, fields):
+    """
+    Build a message asking for one JSON object with a value for each field of the schema.
+    """
+    lines = []
+    for field in fields:
+        kind = "list of strings" if field["type"] == "list" else field["type"]
+        if field["pattern"]:
+            kind += f", matching the regular expression {field['pattern']}"
+        line = f'- "{field["name"]}" ({kind})'
+        if field["description"]:
+            line += f": {field['description']}"
+        lines.append(line)
+    return (
+        f"{build_message(prompt, search_results)}\n\n"
+        "Respond with a JSON object with exactly these keys, using null for anything the search "
+        "results do not answer:\n" + "\n".join(lines)
+    )
+
+def _parse_fields_content(content, fields):
+    try:
+        answer = json.loads(content)
+    except ValueError:
+        answer = None
+    return parse_answer(answer, fields)
+
+def extract_fields_with_groq(prompt, search_results, fields, rate_limiter=None):
+    """
+    Extract every field of a schema (see utils.field_schema) for one entity with a single
+    JSON-mode chat completion. Fields that are missing or fail validation are asked for once
+    more, on their own, instead of repeating the whole extraction.
+
+    Returns:
+        dict: {"fields": {field name: value, or None if not found}}, or {"error": message} if
+        the completion failed.
+    """
+    try:
+        content = complete_chat(
+            messages=[{"role": "user", "content": build_fields_message(prompt, search_results, fields)}],
+            rate_limiter=rate_limiter,
+            response_format={"type": "json_object"},
+        )
+    except Exception as e:
+        logger.error(f"Error during structured LLM extraction: {e}")
+        return {"error": str(e)}
+    values, errors = _parse_fields_content(content, fields)
+
+    if errors:
+        logger.info(f"Retrying fields that failed validation: {errors}")
+        retry_fields = [field for field in fields if field["name"] in errors]
+        try:
+            content = complete_chat(
+                messages=[{"role": "user", "content": build_fields_message(prompt, search_results, retry_fields)}],
+                rate_limiter=rate_limiter,
+                response_format={"type": "json_object"},
+            )
+            values.update(_parse_fields_content(content, retry_fields)[0])
+        except Exception as e:
+            logger.error(f"Error retrying fields {list(errors)}: {e}")
+    return {"fields": {field["name"]: values.get(field["name"]) for field in fields}}
+
+async def async_extract_fields_with_groq(prompt, search_results, fields, rate_limiter=None):
+    """
+    Async version of `extract_fields_with_groq`.
+    """
+    try:
+        content = await async_complete_chat(
+            messages=[{"role": "user", "content": build_fields_message(prompt, search_results, fields)}],
+            rate_limiter=rate_limiter,
+            response_format={"type": "json_object"},
+        )
+    except Exception as e:
+        return {"error": str(e)}
+    values, errors = _parse_fields_content(content, fields)
+
+    if errors:
+        logger.info(f"Retrying fields that failed validation: {errors}")
+        retry_fields = [field for field in fields if field["name"] in errors]
+        try:
+            content = await async_complete_chat(
+                messages=[{"role": "user", "content": build_fields_message(prompt, search_results, retry_fields)}],
+                rate_limiter=rate_limiter,
+                response_format={"type": "json_object"},
+            )
+            values.update(_parse_fields_content(content, retry_fields)[0])
+        except Exception as e:
+            logger.error(f"Error retrying fields {list(errors)}: {e}")
+    return {"fields": {field["name"]: values.get(field["name"]) for field in fields}}
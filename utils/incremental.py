@@ -0,0 +1,198 @@
+import asyncio
+import json
+import logging
+from sqlalchemy.exc import IntegrityError
+from utils.cache import make_cache_key
+from utils.database import RowResult, get_session
+from utils.entities import normalize_entity
+from utils.metrics import incremental_rows
+
+logger = logging.getLogger(__name__)
+
+# Rows per IN (...) query, to stay well under the database's bound-parameter limit
+CHUNK_SIZE = 500
+# Completed rows buffered between writes, so an interrupted run keeps most of its progress
+FLUSH_EVERY = 100
+
+def row_fingerprint(stage, entity, *inputs):
+    """
+    Hash a row's placeholder value (normalized like entity deduplication) together with the
+    inputs that determine its result. Returns None for blank values, which are never stored.
+    """
+    key = normalize_entity(entity)
+    if key is None:
+        return None
+    return make_cache_key(stage, key, *inputs)
+
+def search_fingerprint(prompt_template):
+    """
+    Fingerprint function for search rows: the value and the search prompt template.
+    """
+    return lambda entity: row_fingerprint("search", entity, prompt_template)
+
+def extract_fingerprint(prompt_template, search_results, fields=None):
+    """
+    Fingerprint function for extraction rows: the value, the extraction prompt template and the
+    row's search results, which change whenever the search template (or the web) does, plus the
+    field schema of a structured extraction.
+    """
+    if fields:
+        return lambda entity: row_fingerprint("extract", entity, prompt_template, search_results.get(str(entity), []), fields)
+    return lambda entity: row_fingerprint("extract", entity, prompt_template, search_results.get(str(entity), []))
+
+def is_storable(stage, value):
+    """
+    Return False for failed rows, which are not stored so that the next run retries them.
+    """
+    if stage == "search":
+        return bool(value)
+    return not str(value).startswith("Error:")
+
+def _chunks(values):
+    values = list(values)
+    for i in range(0, len(values), CHUNK_SIZE):
+        yield values[i:i + CHUNK_SIZE]
+
+
+class IncrementalRun:
+    """
+    Diff a search or extraction run against the previous run with the same `run_key`.
+
+    Each row is fingerprinted from its placeholder value and the prompt templates. Rows whose
+    fingerprint an earlier run stored reuse that result, even if the row has moved; only the
+    remaining rows (`pending`) need to be dispatched. `merge` combines the reused results with
+    the new ones and stores the new ones for the next run.
+    """
+
+    def __init__(self, run_key, stage, entities, fingerprint, start_row=0):
+        self.run_key = run_key
+        self.stage = stage
+        rows = [(start_row + offset, entity, fingerprint(entity)) for offset, entity in enumerate(entities)]
+        stored_fingerprints, stored_results = self._load(rows)
+
+        self.reused = []
+        self.pending = []
+        self._pending_rows = {}
+        counts = {"reused": 0, "changed": 0, "new": 0}
+        for row_key, entity, fingerprint_value in rows:
+            if fingerprint_value in stored_results:
+                self.reused.append((entity, stored_results[fingerprint_value]))
+                outcome = "reused"
+            else:
+                self.pending.append(entity)
+                self._pending_rows.setdefault(str(entity), []).append((row_key, fingerprint_value))
+                outcome = "changed" if row_key in stored_fingerprints else "new"
+            counts[outcome] += 1
+
+        for outcome, count in counts.items():
+            incremental_rows.inc(count, stage=stage, outcome=outcome)
+        self.stats = {"total": len(rows), **counts}
+        logger.info(
+            f"Incremental {stage} run '{run_key}': {counts['reused']} rows reused, "
+            f"{counts['changed']} changed, {counts['new']} new"
+        )
+
+    def _load(self, rows):
+        """
+        Return ({row_key: stored fingerprint}, {fingerprint: stored result}) for this run's rows.
+        """
+        row_keys = [row_key for row_key, _, _ in rows]
+        fingerprints = {fingerprint for _, _, fingerprint in rows if fingerprint is not None}
+        stored_fingerprints = {}
+        stored_results = {}
+        db = get_session()
+        try:
+            run_rows = db.query(RowResult).filter(RowResult.run_key == self.run_key, RowResult.stage == self.stage)
+            for chunk in _chunks(row_keys):
+                query = run_rows.filter(RowResult.row_key.in_(chunk)).with_entities(RowResult.row_key, RowResult.fingerprint)
+                stored_fingerprints.update(query.all())
+            for chunk in _chunks(fingerprints):
+                query = run_rows.filter(RowResult.fingerprint.in_(chunk)).with_entities(RowResult.fingerprint, RowResult.result)
+                stored_results.update((fingerprint, json.loads(result)) for fingerprint, result in query.all())
+        finally:
+            db.close()
+        return stored_fingerprints, stored_results
+
+    def store(self, completed):
+        """
+        Save (row_key, fingerprint, result) tuples, replacing what each row held before.
+        """
+        latest = {row_key: (fingerprint, value) for row_key, fingerprint, value in completed}
+        db = get_session()
+        try:
+            for chunk in _chunks(latest):
+                existing = {
+                    row.row_key: row for row in db.query(RowResult).filter(
+                        RowResult.run_key == self.run_key, RowResult.stage == self.stage, RowResult.row_key.in_(chunk)
+                    )
+                }
+                for row_key in chunk:
+                    fingerprint, value = latest[row_key]
+                    row = existing.get(row_key)
+                    if row is None:
+                        db.add(RowResult(
+                            run_key=self.run_key, stage=self.stage, row_key=row_key,
+                            fingerprint=fingerprint, result=json.dumps(value)
+                        ))
+                    else:
+                        row.fingerprint = fingerprint
+                        row.result = json.dumps(value)
+            db.commit()
+        except IntegrityError as e:
+            # Another run with the same key wrote these rows first; the next run re-dispatches them
+            db.rollback()
+            logger.warning(f"Could not store {len(latest)} rows of incremental run '{self.run_key}': {e}")
+        finally:
+            db.close()
+
+    def _collect(self, entity, value, buffer):
+        if is_storable(self.stage, value):
+            buffer.extend(
+                (row_key, fingerprint, value)
+                for row_key, fingerprint in self._pending_rows.pop(str(entity), [])
+                if fingerprint is not None
+            )
+
+    def merge(self, pairs):
+        """
+        Yield the reused (entity, result) pairs, then the pairs from dispatching `pending`,
+        storing the new results as they arrive.
+        """
+        yield from self.reused
+        buffer = []
+        try:
+            for entity, value in pairs:
+                self._collect(entity, value, buffer)
+                if len(buffer) >= FLUSH_EVERY:
+                    self.store(buffer)
+                    buffer = []
+                yield entity, value
+        finally:
+            if buffer:
+                self.store(buffer)
+            pairs.close()
+
+    async def merge_async(self, pairs):
+        """
+        Like `merge`, for an async iterator of pairs. Results are stored off the event loop.
+        """
+        for pair in self.reused:
+            yield pair
+        buffer = []
+        try:
+            async for entity, value in pairs:
+                self._collect(entity, value, buffer)
+                if len(buffer) >= FLUSH_EVERY:
+                    await asyncio.to_thread(self.store, buffer)
+                    buffer = []
+                yield entity, value
+        finally:
+            if buffer:
+                await asyncio.to_thread(self.store, buffer)
+            await pairs.aclose()
+
+    def headers(self):
+        """
+        Report how many rows were reused and how many were dispatched.
+        """
+        return {"X-Rows-Reused": str(self.stats["reused"]), "X-Rows-Dispatched": str(len(self.pending))}
@@ -0,0 +1,270 @@
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_
+from utils.database import Job, JobItem, get_session
+from utils.search_api import iter_search_entities
+from utils.extraction import iter_extract_entities
+from config.config import SERPAPI_KEY, JOB_WORKERS, JOB_HEARTBEAT_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+JOB_TYPES = ("search", "extract")
+FINISHED_STATUSES = ("completed", "cancelled", "failed")
+
+# Worker pool that drains jobs outside of request threads
+job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS)
+
+# Identifies this process as the owner of the jobs it claims
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# Jobs queued on this process's executor, so a sweep does not queue them twice
+_queued = set()
+_queued_lock = threading.Lock()
+
+def _queue_job(job_id):
+    """
+    Queue a job on the local executor unless it is already waiting there.
+    Returns True if it was queued.
+    """
+    with _queued_lock:
+        if job_id in _queued:
+            return False
+        _queued.add(job_id)
+    job_executor.submit(_run_queued_job, job_id)
+    return True
+
+def _run_queued_job(job_id):
+    with _queued_lock:
+        _queued.discard(job_id)
+    process_job(job_id)
+
+def _claimable(now):
+    # Pending jobs, and running jobs whose owner stopped sending heartbeats
+    stale = now - timedelta(seconds=JOB_HEARTBEAT_TIMEOUT)
+    return or_(
+        Job.status == "pending",
+        and_(Job.status == "running", or_(Job.heartbeat_at.is_(None), Job.heartbeat_at < stale)),
+    )
+
+def claim_job(db, job_id):
+    """
+    Atomically take ownership of a job if it is pending or its owner's heartbeat is stale.
+    Returns True if this worker now owns the job; only one worker can win the claim.
+    """
+    now = datetime.utcnow()
+    claimed = (
+        db.query(Job)
+        .filter(Job.id == job_id, _claimable(now))
+        .update({"status": "running", "owner": WORKER_ID, "heartbeat_at": now}, synchronize_session=False)
+    )
+    db.commit()
+    return claimed == 1
+
+def _heartbeat(job_id, stop):
+    """
+    Refresh the job's heartbeat while this worker owns it, until `stop` is set.
+    """
+    while not stop.wait(JOB_HEARTBEAT_TIMEOUT / 3):
+        db = get_session()
+        try:
+            owned = (
+                db.query(Job)
+                .filter(Job.id == job_id, Job.owner == WORKER_ID, Job.status == "running")
+                .update({"heartbeat_at": datetime.utcnow()}, synchronize_session=False)
+            )
+            db.commit()
+        except Exception as e:
+            logger.warning(f"Heartbeat for job {job_id} failed: {e}")
+            db.rollback()
+            continue
+        finally:
+            db.close()
+        if not owned:
+            return
+
+def submit_job(job_type, entities, payload):
+    """
+    Persist a new job with one pending item per entity and queue it for processing.
+    Returns the job ID.
+    """
+    if job_type not in JOB_TYPES:
+        raise ValueError(f"Unknown job type '{job_type}'. Expected one of {JOB_TYPES}.")
+
+    job_id = uuid.uuid4().hex
+    db = get_session()
+    try:
+        db.add(Job(id=job_id, job_type=job_type, status="pending", payload=json.dumps(payload)))
+        db.add_all(
+            JobItem(job_id=job_id, position=position, entity=str(entity))
+            for position, entity in enumerate(entities)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+    _queue_job(job_id)
+    return job_id
+
+def _iter_job_results(job_type, entities, payload):
+    if job_type == "search":
+        return iter_search_entities(entities, payload["prompt_template"], SERPAPI_KEY)
+    return iter_extract_entities(
+        entities, payload["search_results"], payload["prompt_template"],
+        batch_size=payload.get("batch_size"), fields=payload.get("fields")
+    )
+
+def process_job(job_id):
+    """
+    Run every pending item of a job, committing each entity's result as soon as it completes.
+    Items completed by an earlier run are skipped, so this is safe to call again after a crash.
+    The job is claimed first, so a job that another live worker is running is left alone.
+    """
+    db = get_session()
+    stop_heartbeat = threading.Event()
+    try:
+        if not claim_job(db, job_id):
+            return
+        threading.Thread(
+            target=_heartbeat, args=(job_id, stop_heartbeat), name=f"job-heartbeat-{job_id}", daemon=True
+        ).start()
+        job = db.get(Job, job_id)
+
+        pending = db.query(JobItem).filter(JobItem.job_id == job_id, JobItem.status == "pending").all()
+        items_by_entity = {}
+        for item in pending:
+            items_by_entity.setdefault(item.entity, []).append(item)
+
+        payload = json.loads(job.payload)
+        results = _iter_job_results(job.job_type, list(items_by_entity), payload)
+        try:
+            for entity, value in results:
+                for item in items_by_entity[str(entity)]:
+                    item.status = "completed"
+                    item.result = json.dumps(value)
+                db.commit()
+
+                # Stop early if the job was cancelled, or taken over after a missed heartbeat
+                db.refresh(job)
+                if job.status == "cancelled":
+                    logger.info(f"Job {job_id} cancelled.")
+                    return
+                if job.owner != WORKER_ID:
+                    logger.warning(f"Job {job_id} was taken over by {job.owner}, stopping.")
+                    return
+        finally:
+            results.close()
+
+        job.status = "completed"
+        db.commit()
+    except Exception as e:
+        logger.error(f"Job {job_id} failed: {e}")
+        db.rollback()
+        job = db.get(Job, job_id)
+        if job is not None and job.owner == WORKER_ID and job.status == "running":
+            job.status = "failed"
+            job.error = str(e)
+            db.commit()
+    finally:
+        stop_heartbeat.set()
+        db.close()
+
+def get_job_status(job_id):
+    """
+    Return a job's status and per-entity progress counts, or None if the job does not exist.
+    """
+    db = get_session()
+    try:
+        job = db.get(Job, job_id)
+        if job is None:
+            return None
+        total = db.query(JobItem).filter(JobItem.job_id == job_id).count()
+        completed = db.query(JobItem).filter(JobItem.job_id == job_id, JobItem.status == "completed").count()
+        return {
+            "job_id": job.id,
+            "type": job.job_type,
+            "status": job.status,
+            "error": job.error,
+            "completed": completed,
+            "total": total,
+        }
+    finally:
+        db.close()
+
+def get_job_results(job_id):
+    """
+    Return completed results keyed by entity, in entity order, or None if the job does not exist.
+    Results are shaped like the response of the matching synchronous endpoint.
+    """
+    db = get_session()
+    try:
+        if db.get(Job, job_id) is None:
+            return None
+        items = (
+            db.query(JobItem)
+            .filter(JobItem.job_id == job_id, JobItem.status == "completed")
+            .order_by(JobItem.position)
+            .all()
+        )
+        return {item.entity: json.loads(item.result) for item in items}
+    finally:
+        db.close()
+
+def cancel_job(job_id):
+    """
+    Mark a job as cancelled. Returns the job status afterwards, or None if the job does not exist.
+    """
+    db = get_session()
+    try:
+        job = db.get(Job, job_id)
+        if job is None:
+            return None
+        if job.status not in FINISHED_STATUSES:
+            job.status = "cancelled"
+            db.commit()
+        return job.status
+    finally:
+        db.close()
+
+def resume_incomplete_jobs():
+    """
+    Queue jobs left pending, or running by a worker that stopped sending heartbeats (e.g. after a
+    crash). Jobs owned by a live worker are skipped. Returns the IDs of the queued jobs.
+    """
+    db = get_session()
+    try:
+        job_ids = [job.id for job in db.query(Job).filter(_claimable(datetime.utcnow())).all()]
+    finally:
+        db.close()
+
+    resumed = [job_id for job_id in job_ids if _queue_job(job_id)]
+    for job_id in resumed:
+        logger.info(f"Resuming job {job_id}")
+    return resumed
+
+def run_job_sweeper(stop=None):
+    """
+    Resume interrupted jobs now and then every JOB_HEARTBEAT_TIMEOUT seconds, so jobs of a worker
+    that dies are taken over once its heartbeat goes stale. Runs until `stop` is set.
+    """
+    stop = stop or threading.Event()
+    while True:
+        try:
+            resume_incomplete_jobs()
+        except Exception as e:
+            logger.error(f"Resuming jobs failed: {e}")
+        if stop.wait(JOB_HEARTBEAT_TIMEOUT):
+            return
+
+def start_job_sweeper(stop=None):
+    """
+    Start `run_job_sweeper` on a daemon thread. Call once from the serving process at startup.
+    """
+    thread = threading.Thread(target=run_job_sweeper, args=(stop,), name="job-sweeper", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,190 @@
+import bisect
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from config.config import LOG_PAYLOAD_SAMPLE_RATE
+
+# In-process metrics, exposed in the Prometheus text format by the backend's /metrics endpoint
+
+# Latency buckets in seconds, from fast cache lookups to slow LLM calls with retries
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry = []
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """
+    Monotonically increasing count, optionally split by labels.
+    """
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge:
+    """
+    Value that can go up and down, optionally split by labels.
+    """
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def set(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """
+    Distribution of observed values (e.g. durations in seconds) in cumulative buckets.
+    """
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            series["counts"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), series["counts"]):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', le)])} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {series['sum']!r}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series['count']}")
+        return lines
+
+
+# Shared metrics for the pipeline
+stage_seconds = Histogram(
+    "pipeline_stage_seconds", "Time spent per pipeline stage.", ("stage", "outcome")
+)
+cache_lookups = Counter(
+    "cache_lookups_total", "Result cache lookups by cache and outcome.", ("cache", "result")
+)
+retries = Counter(
+    "external_call_retries_total", "Retried calls to external providers.", ("provider", "reason")
+)
+rate_limit_waits = Counter(
+    "rate_limit_waits_total", "Calls that had to wait for a rate limiter token.", ("limiter",)
+)
+rate_limit_wait_seconds = Counter(
+    "rate_limit_wait_seconds_total", "Seconds spent waiting for rate limiter tokens.", ("limiter",)
+)
+limiter_rate = Gauge(
+    "limiter_rate_per_second", "Current adaptive request rate per provider.", ("limiter",)
+)
+limiter_concurrency = Gauge(
+    "limiter_concurrency", "Current adaptive cap on calls in flight per provider.", ("limiter",)
+)
+incremental_rows = Counter(
+    "incremental_rows_total", "Rows of incremental runs by stage and outcome (reused, changed, new).", ("stage", "outcome")
+)
+http_request_seconds = Histogram(
+    "http_request_seconds", "Time to produce an HTTP response (streamed bodies excluded).",
+    ("endpoint", "method", "status"),
+)
+
+@contextmanager
+def span(stage):
+    """
+    Time the enclosed block into `pipeline_stage_seconds`, with outcome "ok" or "error".
+    """
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, stage=stage, outcome=outcome)
+
+def record_rate_limit_wait(limiter, waited):
+    """
+    Count a rate limiter wait, if there was one.
+    """
+    if waited:
+        rate_limit_waits.inc(limiter=limiter)
+        rate_limit_wait_seconds.inc(waited, limiter=limiter)
+
+def log_payload(logger, message, *args):
+    """
+    Log a (potentially large) request/response payload at DEBUG level for a random sample of calls.
+    Sampling is controlled by LOG_PAYLOAD_SAMPLE_RATE and is off by default, so the payload is
+    neither formatted nor written on the hot path.
+    """
+    if LOG_PAYLOAD_SAMPLE_RATE > 0 and random.random() < LOG_PAYLOAD_SAMPLE_RATE and logger.isEnabledFor(logging.DEBUG):
+        logger.debug(message, *args)
+
+def render_metrics():
+    """
+    Return all registered metrics in the Prometheus text exposition format.
+    """
+    lines = []
+    for metric in list(_registry):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
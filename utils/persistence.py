@@ -0,0 +1,234 @@
+import csv
+import io
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import String, insert, select
+from utils.database import Dataset, Run, RunResult, get_engine, get_session
+from utils.dataset_store import delete_dataset_files
+from utils.metrics import span
+from config.config import PERSIST_BATCH_ROWS, DATASET_RETENTION_DAYS, DATASET_SWEEP_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+RUN_TYPES = ("search", "extract")
+RESULT_COLUMNS = ("run_id", "position", "entity", "result")
+
+def _copy_rows(connection, table, columns, rows):
+    """
+    Stream rows into a PostgreSQL table with COPY FROM STDIN, in CSV format.
+    Text columns are loaded with FORCE_NOT_NULL: csv.writer writes "" as an empty field, which
+    COPY would otherwise read as NULL, so blank entities would not match those stored by executemany.
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    options = "FORMAT csv"
+    text_columns = [column for column in columns if isinstance(table.c[column].type, String)]
+    if text_columns:
+        options += f", FORCE_NOT_NULL ({', '.join(text_columns)})"
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH ({options})", buffer)
+    finally:
+        cursor.close()
+
+def bulk_insert(connection, table, columns, rows):
+    """
+    Insert tuples of `columns` values into `table` on an open connection: with COPY on
+    PostgreSQL (psycopg2), otherwise (e.g. SQLite) with executemany batches of PERSIST_BATCH_ROWS rows.
+    """
+    if connection.dialect.name == "postgresql" and connection.dialect.driver == "psycopg2":
+        _copy_rows(connection, table, columns, rows)
+        return
+    for i in range(0, len(rows), PERSIST_BATCH_ROWS):
+        connection.execute(insert(table), [dict(zip(columns, row)) for row in rows[i:i + PERSIST_BATCH_ROWS]])
+
+def register_dataset(dataset_id, columns, row_count, source=None):
+    """
+    Record a stored dataset so it can be listed later.
+    """
+    db = get_session()
+    try:
+        db.add(Dataset(id=dataset_id, source=source, columns=json.dumps(columns), row_count=row_count))
+        db.commit()
+    finally:
+        db.close()
+
+def purge_expired_datasets(retention_days=None):
+    """
+    Delete datasets stored more than `retention_days` (default DATASET_RETENTION_DAYS) ago: their
+    `datasets` rows and Parquet files, plus dataset files that were never registered. Runs keep
+    their results. Returns the IDs of the deleted datasets; a retention of 0 keeps everything.
+    """
+    retention_days = DATASET_RETENTION_DAYS if retention_days is None else retention_days
+    if retention_days <= 0:
+        return []
+
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    db = get_session()
+    try:
+        expired = [dataset.id for dataset in db.query(Dataset.id).filter(Dataset.created_at < cutoff)]
+        # Rows go first, so a listed dataset never points at a deleted file
+        db.query(Dataset).filter(Dataset.id.in_(expired)).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+    deleted = set(delete_dataset_files(expired, max_age_seconds=retention_days * 86400)) | set(expired)
+    if deleted:
+        logger.info(f"Deleted {len(deleted)} datasets older than {retention_days} days.")
+    return sorted(deleted)
+
+def run_dataset_sweeper(stop=None):
+    """
+    Purge expired datasets now and then every DATASET_SWEEP_INTERVAL seconds, until `stop` is set.
+    """
+    stop = stop or threading.Event()
+    while True:
+        try:
+            purge_expired_datasets()
+        except Exception as e:
+            logger.error(f"Purging expired datasets failed: {e}")
+        if stop.wait(DATASET_SWEEP_INTERVAL):
+            return
+
+def start_dataset_sweeper(stop=None):
+    """
+    Start `run_dataset_sweeper` on a daemon thread. Call once from the serving process at startup.
+    Retention is opt-in: nothing is started unless DATASET_RETENTION_DAYS is set.
+    """
+    if DATASET_RETENTION_DAYS <= 0:
+        return None
+    thread = threading.Thread(target=run_dataset_sweeper, args=(stop,), name="dataset-sweeper", daemon=True)
+    thread.start()
+    return thread
+
+def list_datasets(limit=50):
+    """
+    Return the most recently stored datasets, newest first.
+    """
+    db = get_session()
+    try:
+        datasets = db.query(Dataset).order_by(Dataset.created_at.desc()).limit(limit).all()
+        return [
+            {
+                "dataset_id": dataset.id,
+                "source": dataset.source,
+                "columns": json.loads(dataset.columns),
+                "row_count": dataset.row_count,
+                "created_at": dataset.created_at.isoformat(),
+            }
+            for dataset in datasets
+        ]
+    finally:
+        db.close()
+
+def save_run(results, run_type, run_id, dataset_id=None, prompt_template=None):
+    """
+    Persist a run's results dict (keyed by entity, in row order) in one transaction, bulk-loading
+    the result rows. Returns the run ID.
+    """
+    if run_type not in RUN_TYPES:
+        raise ValueError(f"Unknown run type '{run_type}'. Expected one of {RUN_TYPES}.")
+    rows = [
+        (run_id, position, entity, json.dumps(value))
+        for position, (entity, value) in enumerate(results.items())
+    ]
+    with span("persist_run"), get_engine().begin() as connection:
+        connection.execute(insert(Run.__table__).values(
+            id=run_id, run_type=run_type, dataset_id=dataset_id,
+            prompt_template=prompt_template, row_count=len(rows)
+        ))
+        bulk_insert(connection, RunResult.__table__, RESULT_COLUMNS, rows)
+    return run_id
+
+def _run_info(run):
+    return {
+        "run_id": run.id,
+        "type": run.run_type,
+        "dataset_id": run.dataset_id,
+        "prompt_template": run.prompt_template,
+        "row_count": run.row_count,
+        "created_at": run.created_at.isoformat(),
+    }
+
+def load_run(run_id, run_type=None):
+    """
+    Load a run's results dict keyed by entity, in row order.
+    Raises KeyError if there is no such run (of `run_type`, if given).
+    """
+    db = get_session()
+    try:
+        run = db.get(Run, run_id)
+        if run is None or (run_type is not None and run.run_type != run_type):
+            raise KeyError(f"Unknown results '{run_id}'.")
+        rows = db.execute(
+            select(RunResult.entity, RunResult.result)
+            .where(RunResult.run_id == run_id)
+            .order_by(RunResult.position)
+        )
+        return {entity: json.loads(result) for entity, result in rows}
+    finally:
+        db.close()
+
+def load_run_rows(run_id, start_row=0, end_row=None):
+    """
+    Load one window of a run's results, by row position, without reading the rest of the run.
+    Returns the run info with 'rows' ([{"position", "entity", "result"}]).
+    Raises KeyError if there is no such run.
+    """
+    db = get_session()
+    try:
+        run = db.get(Run, run_id)
+        if run is None:
+            raise KeyError(f"Unknown results '{run_id}'.")
+        query = (
+            select(RunResult.position, RunResult.entity, RunResult.result)
+            .where(RunResult.run_id == run_id, RunResult.position >= start_row)
+            .order_by(RunResult.position)
+        )
+        if end_row is not None:
+            query = query.where(RunResult.position < end_row)
+        rows = [
+            {"position": position, "entity": entity, "result": json.loads(result)}
+            for position, entity, result in db.execute(query)
+        ]
+        return {**_run_info(run), "rows": rows}
+    finally:
+        db.close()
+
+def list_runs(dataset_id=None, run_type=None, limit=50):
+    """
+    Return the most recent runs, newest first, optionally for one dataset or run type.
+    """
+    db = get_session()
+    try:
+        query = db.query(Run)
+        if dataset_id is not None:
+            query = query.filter(Run.dataset_id == dataset_id)
+        if run_type is not None:
+            query = query.filter(Run.run_type == run_type)
+        return [_run_info(run) for run in query.order_by(Run.created_at.desc()).limit(limit).all()]
+    finally:
+        db.close()
+
+def find_entity_results(entity, run_type=None, limit=10):
+    """
+    Return stored results for one entity across past runs, newest first, so they can be looked
+    up without repeating the API calls.
+    """
+    db = get_session()
+    try:
+        query = (
+            db.query(Run, RunResult.result)
+            .join(RunResult, RunResult.run_id == Run.id)
+            .filter(RunResult.entity == entity)
+        )
+        if run_type is not None:
+            query = query.filter(Run.run_type == run_type)
+        rows = query.order_by(Run.created_at.desc()).limit(limit).all()
+        return [{**_run_info(run), "result": json.loads(result)} for run, result in rows]
+    finally:
+        db.close()
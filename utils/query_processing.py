@@ -1,64 +1,121 @@
+import json
 import pandas as pd
-import requests
 import streamlit as st
 from streamlit import cache_data
+from utils.backend_client import backend_get, backend_post
+from utils.wire_format import ARROW_STREAM_MIMETYPE, JSON_MIMETYPE, ipc_to_dataframe
 
-# Define the backend URL
-BACKEND_URL = "http://localhost:5000"
+# Ask data endpoints for Arrow IPC, falling back to JSON if the backend does not offer it
+DATA_ACCEPT = {"Accept": f"{ARROW_STREAM_MIMETYPE}, {JSON_MIMETYPE};q=0.9"}
+
+def _read_data_response(response):
+    """
+    Decode a data endpoint response (Arrow IPC or JSON) into (columns, DataFrame, metadata dict).
+    """
+    if response.headers.get("Content-Type", "").startswith(ARROW_STREAM_MIMETYPE):
+        df, metadata = ipc_to_dataframe(response.content)
+        return metadata.get("columns", df.columns.tolist()), df, metadata
+    data = response.json()
+    columns = data["columns"]
+    return columns, pd.DataFrame(data.pop("preview"), columns=columns), data
 
 # Cache the function to load data from backend to avoid reloading on each interaction
 @cache_data
 def load_data_from_backend(file, start_row=0, end_row=None):
     """
-    Load data from the backend (CSV upload) and return the columns and preview data.
+    Load data from the backend (CSV upload) and return the columns, preview data and the
+    dataset ID the backend stored the file under.
     """
     try:
-        response = requests.post(f"{BACKEND_URL}/upload_csv", files={"file": file})
+        # The backend parses only the requested row window, so slicing happens server-side
+        form = {"start_row": start_row}
+        if end_row is not None:
+            form["end_row"] = end_row
+            form["preview_rows"] = max(end_row - start_row, 0)
+        response = backend_post("/upload_csv", files={"file": file}, data=form, headers=DATA_ACCEPT)
         
         # Check for successful response
         if response.status_code == 200:
-            data = response.json()
-            columns = data["columns"]
+            columns, preview_data, data = _read_data_response(response)
             
-            # Load the preview data and apply row range slicing
-            preview_data = pd.DataFrame(data["preview"])
-            if end_row is None or end_row > len(preview_data):
-                end_row = len(preview_data)  # Default to the last row if end_row is not specified or out of bounds
-            preview_data = preview_data.iloc[start_row:end_row]
-            
-            return columns, preview_data
+            return columns, preview_data, data.get("dataset_id")
         else:
             st.error(f"Failed to load data from backend: {response.status_code} - {response.text}")
-            return None, None
+            return None, None, None
+    except Exception as e:
+        st.error(f"Error loading data from backend: {str(e)}")
+        return None, None, None
+
+def stream_upload_files_via_backend(files, start_row=0, end_row=None):
+    """
+    Upload several CSV files in one request and yield each file's result as soon as the backend
+    has parsed it. The backend parses the files in parallel.
+    Each result has 'filename', 'status', 'completed' and 'total', plus 'columns', 'preview'
+    (a DataFrame) and 'dataset_id' on success or 'error' on failure.
+    """
+    form = {"start_row": start_row, "stream": "true"}
+    if end_row is not None:
+        form["end_row"] = end_row
+        form["preview_rows"] = max(end_row - start_row, 0)
+
+    try:
+        upload = [("files", (file.name, file)) for file in files]
+        with backend_post("/upload_csv_batch", files=upload, data=form, stream=True) as response:
+            if response.status_code != 200:
+                st.error(f"Failed to load data from backend: {response.status_code} - {response.text}")
+                return
+            for line in response.iter_lines():
+                if line:
+                    result = json.loads(line)
+                    if result["status"] == 200:
+                        result["preview"] = pd.DataFrame(result["preview"], columns=result["columns"])
+                    yield result
     except Exception as e:
         st.error(f"Error loading data from backend: {str(e)}")
+
+def load_dataset_rows(dataset_id, start_row=0, end_row=None):
+    """
+    Load a row window of a dataset already stored by the backend, without re-uploading it.
+    """
+    params = {"start_row": start_row}
+    if end_row is not None:
+        params["end_row"] = end_row
+
+    try:
+        response = backend_get(f"/datasets/{dataset_id}", params=params, headers=DATA_ACCEPT)
+        if response.status_code == 200:
+            columns, preview_data, _ = _read_data_response(response)
+            return columns, preview_data
+        else:
+            st.error(f"Failed to load dataset rows: {response.status_code} - {response.text}")
+            return None, None
+    except Exception as e:
+        st.error(f"Error loading dataset rows: {str(e)}")
         return None, None
 
 def load_data_from_google_sheet(url, start_row=0, end_row=None):
     """
-    Load data from Google Sheets via the backend service and return the columns and preview data.
+    Load data from Google Sheets via the backend service and return the columns, preview data
+    and the dataset ID the backend stored the fetched rows under.
     """
     try:
-        response = requests.post(f"{BACKEND_URL}/connect_google_sheet", json={"sheet_url": url})
+        # The backend fetches only the requested row window from the sheet
+        payload = {"sheet_url": url, "start_row": start_row}
+        if end_row is not None:
+            payload["end_row"] = end_row
+        response = backend_post("/connect_google_sheet", payload, headers=DATA_ACCEPT)
         
         # Check for successful response
         if response.status_code == 200:
-            data = response.json()
-            columns = data["columns"]
-            
-            # Load the preview data and apply row range slicing
-            preview_data = pd.DataFrame(data["preview"])
-            if end_row is None or end_row > len(preview_data):
-                end_row = len(preview_data)
-            preview_data = preview_data.iloc[start_row:end_row]
+            columns, preview_data, data = _read_data_response(response)
             
-            return columns, preview_data
+            return columns, preview_data, data.get("dataset_id")
         else:
             st.error(f"Failed to load data from Google Sheets: {response.status_code} - {response.text}")
-            return None, None
+            return None, None, None
     except Exception as e:
         st.error(f"Error loading data from Google Sheets: {str(e)}")
-        return None, None
+        return None, None, None
 
 def search_entities_via_backend(entities, prompt_template):
     """
@@ -70,7 +127,7 @@ def search_entities_via_backend(entities, prompt_template):
     }
     
     try:
-        response = requests.post(f"{BACKEND_URL}/search_entities", json=payload)
+        response = backend_post("/search_entities", payload)
         
         # Check for successful response
         if response.status_code == 200:
@@ -82,3 +139,109 @@ def search_entities_via_backend(entities, prompt_template):
         st.error(f"Error in search_entities_via_backend: {str(e)}")
         return {}
 
+def _stream_ndjson(path, payload, error_label, response_headers=None):
+    """
+    POST `payload` to a streaming backend endpoint and yield each NDJSON line as a dict.
+    If `response_headers` is a dict, it is filled with the response headers.
+    """
+    try:
+        with backend_post(path, {**payload, "stream": True}, stream=True) as response:
+            if response_headers is not None:
+                response_headers.update(response.headers)
+            if response.status_code != 200:
+                st.error(f"Error in {error_label}: {response.status_code} - {response.text}")
+                return
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+    except Exception as e:
+        st.error(f"Error in {error_label}: {str(e)}")
+
+def stream_search_entities_via_backend(entities, prompt_template, dataset_ref=None, response_headers=None):
+    """
+    Perform a search for multiple entities via the backend, yielding each entity's
+    results as soon as they are ready.
+    If `dataset_ref` ('dataset_id', 'column', 'start_row', 'end_row') is given, the backend reads
+    the entities from its stored dataset instead of receiving the entity list.
+    The ID of the stored results is available afterwards in `response_headers["X-Results-Id"]`.
+    """
+    payload = dict(dataset_ref) if dataset_ref else {"entities": entities}
+    payload["prompt_template"] = prompt_template
+    yield from _stream_ndjson("/search_entities", payload, "stream_search_entities_via_backend", response_headers)
+
+def stream_extract_information_via_backend(entities, search_results, prompt_template, dataset_ref=None, results_id=None, response_headers=None, fields=None):
+    """
+    Run LLM extraction for multiple entities via the backend, yielding each entity's
+    extracted information as soon as it is ready.
+    If `results_id` is given, the backend uses its stored search results instead of receiving them.
+    If `fields` (a list of field names) is given, each entity's information is a dict with one
+    value per field, extracted in a single LLM call.
+    """
+    payload = dict(dataset_ref) if dataset_ref else {"entities": entities}
+    if results_id:
+        payload["results_id"] = results_id
+    else:
+        payload["search_results"] = search_results
+    if fields:
+        payload["fields"] = fields
+    payload["prompt_template"] = prompt_template
+    yield from _stream_ndjson("/extract_information", payload, "stream_extract_information_via_backend", response_headers)
+
+def load_run_rows(results_id, start_row=0, end_row=None):
+    """
+    Load one page of a stored search or extraction run from the backend.
+    Returns (rows, row_count), where rows are dicts with 'position', 'entity' and 'result',
+    or (None, 0) on failure.
+    """
+    params = {"start_row": start_row}
+    if end_row is not None:
+        params["end_row"] = end_row
+
+    try:
+        response = backend_get(f"/runs/{results_id}/rows", params=params)
+        if response.status_code == 200:
+            data = response.json()
+            return data["rows"], data["row_count"]
+        else:
+            st.error(f"Failed to load results: {response.status_code} - {response.text}")
+            return None, 0
+    except Exception as e:
+        st.error(f"Error loading results: {str(e)}")
+        return None, 0
+
+def load_run_results(results_id):
+    """
+    Load all results of a stored run, keyed by entity in row order, or None on failure.
+    """
+    try:
+        response = backend_get(f"/runs/{results_id}")
+        if response.status_code == 200:
+            return response.json()
+        else:
+            st.error(f"Failed to load results: {response.status_code} - {response.text}")
+            return None
+    except Exception as e:
+        st.error(f"Error loading results: {str(e)}")
+        return None
+
+def write_back_to_google_sheet(url, column, values, start_row=0, write_id=None):
+    """
+    Write `values` into `column` of the Google Sheet via the backend, one value per row from
+    data row `start_row`. Pass the `write_id` of a failed write to resume it instead.
+    Returns the backend's write status (with 'write_id', 'status' and 'rows_written'), or None.
+    """
+    try:
+        if write_id:
+            response = backend_post(f"/sheets/write_back/{write_id}/resume")
+        else:
+            payload = {"sheet_url": url, "column": column, "values": values, "start_row": start_row}
+            response = backend_post("/sheets/write_back", payload)
+
+        # A failed write still returns its status, so it can be resumed
+        if response.status_code in (200, 502) and "write_id" in response.json():
+            return response.json()
+        st.error(f"Error writing to Google Sheets: {response.status_code} - {response.text}")
+        return None
+    except Exception as e:
+        st.error(f"Error writing to Google Sheets: {str(e)}")
+        return None
@@ -0,0 +1,280 @@
+import asyncio
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from utils.metrics import record_rate_limit_wait, limiter_rate, limiter_concurrency
+
+
+class TokenBucket:
+    """
+    Thread-safe token-bucket rate limiter.
+
+    Tokens refill continuously at `rate` per second up to `capacity`. Each call
+    to `acquire` takes one token, blocking until one is available. Waits are
+    recorded in the rate-limit metrics under `name`.
+    """
+
+    def __init__(self, rate, capacity=None, name="default"):
+        if rate <= 0:
+            raise ValueError("rate must be greater than zero.")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.name = name
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate):
+        """
+        Change the refill rate, keeping the tokens accrued at the old rate.
+        """
+        with self._lock:
+            self._refill()
+            self.rate = float(rate)
+
+    def drain(self):
+        """
+        Drop all stored tokens so the next call waits a full token interval.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._last_refill = now
+
+    def _try_acquire(self, tokens):
+        """
+        Consume `tokens` if available and return 0, otherwise return the seconds to wait.
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens=1):
+        """
+        Block until `tokens` tokens are available, then consume them.
+        Returns the number of seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            wait_time = self._try_acquire(tokens)
+            if not wait_time:
+                record_rate_limit_wait(self.name, waited)
+                return waited
+            time.sleep(wait_time)
+            waited += wait_time
+
+    async def acquire_async(self, tokens=1):
+        """
+        Like `acquire`, but waits with asyncio.sleep so the event loop keeps running.
+        """
+        waited = 0.0
+        while True:
+            wait_time = self._try_acquire(tokens)
+            if not wait_time:
+                record_rate_limit_wait(self.name, waited)
+                return waited
+            await asyncio.sleep(wait_time)
+            waited += wait_time
+
+
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+def parse_duration(value):
+    """
+    Parse a rate-limit reset value such as "20", "7.66s", "250ms" or "2m59.56s" into seconds.
+    Returns None if the value cannot be parsed.
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PART.findall(value)
+    if not parts or "".join(number + unit for number, unit in parts) != value:
+        return None
+    return sum(float(number) * DURATION_UNITS[unit] for number, unit in parts)
+
+def jittered_backoff(attempt, base):
+    """
+    Exponential backoff for retry number `attempt` (from 0), plus up to `base` seconds of jitter.
+    """
+    return base * (2 ** attempt) + random.uniform(0, base)
+
+
+def _resolve_waiter(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class AdaptiveLimiter:
+    """
+    Per-provider limiter that adapts to the provider's responses.
+
+    Combines a token bucket (request rate) with a cap on calls in flight. Both start at the
+    configured maximum and follow AIMD: a throttled call halves them, and each successful call
+    adds a little back until the maximum is reached again. A Retry-After value, or rate-limit
+    headers reporting an exhausted quota, pause every caller until the quota resets.
+    """
+
+    def __init__(self, name, rate, burst=None, max_concurrency=1, min_rate=None, decrease_interval=1.0):
+        self.name = name
+        self.max_rate = float(rate)
+        self.min_rate = float(min_rate if min_rate is not None else self.max_rate / 20)
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.bucket = TokenBucket(rate, burst, name=name)
+        self.concurrency = float(self.max_concurrency)
+        # Several in-flight calls usually hit the same limit; only back off once per interval
+        self.decrease_interval = decrease_interval
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+        # (event loop, future) of coroutines waiting for a concurrency slot, oldest first
+        self._async_waiters = deque()
+        self._publish()
+
+    def _publish(self):
+        limiter_rate.set(self.bucket.rate, limiter=self.name)
+        limiter_concurrency.set(int(self.concurrency), limiter=self.name)
+
+    def _wake_async_waiters(self):
+        """
+        Wake as many waiting coroutines as there are free concurrency slots. Called with the
+        condition held; futures are resolved on their own loop, since release may run in any thread.
+        """
+        for _ in range(int(self.concurrency) - self._in_flight):
+            if not self._async_waiters:
+                return
+            loop, waiter = self._async_waiters.popleft()
+            loop.call_soon_threadsafe(_resolve_waiter, waiter)
+
+    def _pause_remaining(self):
+        return max(0.0, self._paused_until - time.monotonic())
+
+    def acquire(self):
+        """
+        Block until a call may start: a concurrency slot is free, no pause is active and a rate
+        token is available. Must be paired with `release`; prefer the `slot` context manager.
+        """
+        with self._condition:
+            while self._in_flight >= int(self.concurrency):
+                self._condition.wait()
+            self._in_flight += 1
+        pause = self._pause_remaining()
+        if pause:
+            time.sleep(pause)
+            record_rate_limit_wait(self.name, pause)
+        self.bucket.acquire()
+
+    async def acquire_async(self):
+        """
+        Like `acquire`, but waits on a future resolved by `release` or `record_success`, so
+        waiting coroutines use no CPU and the event loop keeps running.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                if self._in_flight < int(self.concurrency):
+                    self._in_flight += 1
+                    break
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                with self._condition:
+                    try:
+                        self._async_waiters.remove((loop, waiter))
+                    except ValueError:
+                        # Already woken: pass the wakeup on so the free slot is not lost
+                        self._wake_async_waiters()
+                raise
+        pause = self._pause_remaining()
+        if pause:
+            await asyncio.sleep(pause)
+            record_rate_limit_wait(self.name, pause)
+        await self.bucket.acquire_async()
+
+    def release(self):
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify()
+            self._wake_async_waiters()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def slot_async(self):
+        await self.acquire_async()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def record_success(self):
+        """
+        Additive increase: recover toward the maximums by about one concurrent call, and 5% of
+        the maximum rate, per second of successful calls.
+        """
+        with self._condition:
+            if self.concurrency < self.max_concurrency or self.bucket.rate < self.max_rate:
+                rate = self.bucket.rate
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1 / max(1.0, rate))
+                self.bucket.set_rate(min(self.max_rate, rate + self.max_rate / 20 / rate))
+                self._condition.notify_all()
+                self._wake_async_waiters()
+                self._publish()
+
+    def record_throttle(self, retry_after=None):
+        """
+        Multiplicative decrease after a rate-limit response, and pause all callers for
+        `retry_after` seconds (or one token interval if the provider did not say).
+        """
+        now = time.monotonic()
+        with self._condition:
+            if now - self._last_decrease >= self.decrease_interval:
+                self._last_decrease = now
+                self.concurrency = max(1.0, self.concurrency / 2)
+                self.bucket.set_rate(max(self.min_rate, self.bucket.rate / 2))
+                # Stored burst tokens would immediately overrun the provider again
+                self.bucket.drain()
+                self._publish()
+            pause = retry_after if retry_after is not None else 1 / self.bucket.rate
+            self._paused_until = max(self._paused_until, now + pause)
+
+    def update_from_headers(self, headers):
+        """
+        Pause until the quota resets when x-ratelimit-remaining-* headers report it exhausted.
+        """
+        for kind in ("requests", "tokens"):
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            if remaining is None:
+                continue
+            try:
+                exhausted = float(remaining) <= 0
+            except ValueError:
+                continue
+            reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+            if exhausted and reset:
+                with self._condition:
+                    self._paused_until = max(self._paused_until, time.monotonic() + reset)
@@ -1,18 +1,91 @@
 import os
+import asyncio
+import re
 import time
-from serpapi import GoogleSearch
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import logging
+from utils.rate_limiter import AdaptiveLimiter, jittered_backoff, parse_duration
+from utils.entities import dedupe_entities
+from utils.cache import ResultCache, make_cache_key
+from utils.metrics import span, log_payload, retries
+from config.config import (
+    SEARCH_MAX_WORKERS, SEARCH_RATE_LIMIT, SEARCH_BURST, SEARCH_MAX_RETRIES, SEARCH_BACKOFF_BASE,
+    CACHE_FOLDER, SEARCH_CACHE_TTL, SEARCH_CACHE_MAX_ENTRIES, SEARCH_EMPTY_CACHE_TTL
+)
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)  # Changed to DEBUG for detailed logs
 logger = logging.getLogger(__name__)
 
-def search_entity(entity, prompt_template, serpapi_key):
+SERPAPI_SEARCH_URL = "https://serpapi.com/search.json"
+
+# SerpAPI client class, imported on first use so the backend starts without loading it
+GoogleSearch = None
+
+def get_google_search():
     """
-    Perform a web search for the given entity using SerpAPI.
+    Return the SerpAPI GoogleSearch class, importing it on first use.
+    """
+    global GoogleSearch
+    if GoogleSearch is None:
+        from serpapi import GoogleSearch as serpapi_google_search
+        GoogleSearch = serpapi_google_search
+    return GoogleSearch
+
+# Shared across requests so concurrent searches stay within the SerpAPI plan rate;
+# backs off when SerpAPI throttles and recovers toward the configured rate afterwards
+search_rate_limiter = AdaptiveLimiter("serpapi", SEARCH_RATE_LIMIT, SEARCH_BURST, SEARCH_MAX_WORKERS)
+
+# SerpAPI reports throttling as an "error" message in the JSON body
+THROTTLE_PATTERN = re.compile(r"throughput|rate.?limit|too many requests", re.IGNORECASE)
+# ...and a query without results the same way
+NO_RESULTS_PATTERN = re.compile(r"hasn't returned any results", re.IGNORECASE)
+
+# On-disk cache of search results, keyed by the rendered query and SerpAPI params
+search_cache = ResultCache(
+    os.path.join(CACHE_FOLDER, "search_cache.sqlite3"),
+    table="search_results",
+    ttl=SEARCH_CACHE_TTL,
+    max_entries=SEARCH_CACHE_MAX_ENTRIES,
+)
+# Queries SerpAPI answered with no results, kept for a shorter time in case results appear later
+empty_search_cache = ResultCache(
+    os.path.join(CACHE_FOLDER, "search_cache.sqlite3"),
+    table="empty_search_results",
+    ttl=SEARCH_EMPTY_CACHE_TTL,
+    max_entries=SEARCH_CACHE_MAX_ENTRIES,
+)
+
+def get_cached_search(cache_key):
+    """
+    Return the cached results for a search, [] for a cached "no results" answer, or None.
+    """
+    cached = search_cache.get(cache_key)
+    if cached is None and empty_search_cache.get(cache_key) is not None:
+        return []
+    return cached
+
+def cache_search(cache_key, outcome, output):
+    """
+    Cache a definitive answer: results of an "ok" search, or an "empty" one. Errors are not
+    cached, so they are retried next time.
+    """
+    if outcome == "ok":
+        search_cache.set(cache_key, output)
+    elif outcome == "empty":
+        empty_search_cache.set(cache_key, True)
+
+def search_cache_key(params):
+    """
+    Build the cache key for a SerpAPI request, leaving out the API key.
+    """
+    return make_cache_key({name: value for name, value in params.items() if name != "api_key"})
+
+def build_search_params(entity, prompt_template, serpapi_key):
+    """
+    Render the query for an entity and build the SerpAPI request parameters.
     """
     query = prompt_template.format(entity=entity)
-    params = {
+    return {
         "q": query,
         "location": "Austin, Texas, United States",
         "hl": "en",
@@ -20,45 +93,210 @@ def search_entity(entity, prompt_template, serpapi_key):
         "google_domain": "google.com",
         "api_key": serpapi_key
     }
-    
-    try:
-        # Initialize GoogleSearch with parameters
-        search = GoogleSearch(params)
-        
-        # Execute the search and get results
-        results = search.get_dict()
-        
-        # Debug: Log the full results from SerpAPI
-        logger.debug(f"Raw search results for '{query}': {results}")
-
-        # Extract and return relevant information from the results
-        output = []
-        for result in results.get("organic_results", []):
-            output.append({
-                "title": result.get("title"),
-                "link": result.get("link"),
-                "snippet": result.get("snippet")
-            })
-
-        # Debug: Log the extracted output for verification
-        logger.info(f"Extracted output for '{entity}': {output}")
-
-        return output
-    except Exception as e:
-        logger.error(f"Error performing search for {entity}: {e}")
-        return []
 
-def search_entities(entities, prompt_template, serpapi_key):
+def parse_organic_results(results):
+    """
+    Extract the title, link and snippet of each organic result from a SerpAPI response.
+    """
+    output = []
+    for result in results.get("organic_results", []):
+        output.append({
+            "title": result.get("title"),
+            "link": result.get("link"),
+            "snippet": result.get("snippet")
+        })
+    return output
+
+def classify_search_response(results, status_code=200):
+    """
+    Classify a SerpAPI response as "ok", "empty" (no results for the query), "throttled",
+    "transient" (worth retrying) or "failed".
+    """
+    error = results.get("error") if isinstance(results, dict) else None
+    if status_code == 429 or (error and THROTTLE_PATTERN.search(str(error))):
+        return "throttled"
+    if status_code >= 500:
+        return "transient"
+    if status_code == 200 and error and NO_RESULTS_PATTERN.search(str(error)):
+        return "empty"
+    if error or status_code != 200:
+        # e.g. an invalid key or exhausted plan: retrying will not help
+        return "failed"
+    return "ok"
+
+def _handle_search_outcome(outcome, attempt, rate_limiter, retry_after=None):
+    """
+    Record a retryable outcome with the limiter and return how long this caller should sleep.
+    """
+    retries.inc(provider="serpapi", reason=outcome)
+    if outcome == "throttled" and rate_limiter is not None:
+        # The limiter pauses every caller, so no extra sleep is needed here
+        rate_limiter.record_throttle(retry_after)
+        return 0.0
+    return retry_after if retry_after is not None else jittered_backoff(attempt, SEARCH_BACKOFF_BASE)
+
+def search_entity(entity, prompt_template, serpapi_key, rate_limiter=None):
+    """
+    Perform a web search for the given entity using SerpAPI.
+    Cached results are returned without calling SerpAPI or waiting on `rate_limiter`.
+    Throttled and transient failures are retried up to SEARCH_MAX_RETRIES times; throttling
+    also slows `rate_limiter` down for every caller.
+    """
+    params = build_search_params(entity, prompt_template, serpapi_key)
+    query = params["q"]
+
+    cache_key = search_cache_key(params)
+    cached = get_cached_search(cache_key)
+    if cached is not None:
+        logger.info(f"Cache hit for '{query}'")
+        return cached
+
+    last_error = None
+    for attempt in range(SEARCH_MAX_RETRIES + 1):
+        try:
+            with rate_limiter.slot() if rate_limiter is not None else nullcontext():
+                # Initialize GoogleSearch with parameters and execute the search
+                with span("search_call"):
+                    results = get_google_search()(params).get_dict()
+            outcome = classify_search_response(results)
+        except Exception as e:
+            results, outcome = {"error": str(e)}, "transient"
+
+        # Debug: Log the full results from SerpAPI for a sample of calls
+        log_payload(logger, "Raw search results for '%s': %s", query, results)
+
+        if outcome in ("ok", "empty"):
+            if rate_limiter is not None:
+                rate_limiter.record_success()
+            # Only cache definitive answers so failed searches are retried next time
+            output = parse_organic_results(results)
+            cache_search(cache_key, outcome, output)
+            return output
+        if outcome == "failed":
+            logger.warning(f"Search for '{query}' failed: {results.get('error')}")
+            return parse_organic_results(results)
+
+        last_error = results.get("error")
+        if attempt < SEARCH_MAX_RETRIES:
+            time.sleep(_handle_search_outcome(outcome, attempt, rate_limiter))
+
+    logger.error(f"Error performing search for {entity} after {SEARCH_MAX_RETRIES} retries: {last_error}")
+    return []
+
+def iter_search_entities(entities, prompt_template, serpapi_key, max_workers=None, rate_limiter=None):
     """
-    Perform searches for each entity with rate limiting to avoid API rate limit issues.
+    Search for all entities concurrently, yielding (entity, results) pairs as each search completes.
+
+    At most `max_workers` searches are in flight at once, and each search first takes a
+    token from `rate_limiter` so the overall request rate stays within the SerpAPI plan.
+    Cache hits skip the rate limiter entirely. Equivalent entities (same text up to case and
+    whitespace) share one search, and blank entities get no results without a call. Pending
+    searches are cancelled if the caller stops iterating early.
     """
-    results = {}
-    for entity in entities:
+    max_workers = max_workers or SEARCH_MAX_WORKERS
+    rate_limiter = rate_limiter or search_rate_limiter
+
+    representatives, fan_out, blanks = dedupe_entities(entities, "search entities")
+    for entity in blanks:
+        yield entity, []
+
+    def rate_limited_search(entity):
         logger.info(f"Searching for entity: {entity}")
-        results[entity] = search_entity(entity, prompt_template, serpapi_key)
-        
-        # Rate limiting (adjust based on SerpAPI rate limit policy)
-        time.sleep(1)  # You may adjust this time or calculate based on actual rate limits
+        return search_entity(entity, prompt_template, serpapi_key, rate_limiter=rate_limiter)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {executor.submit(rate_limited_search, entity): entity for entity in representatives}
+        for future in as_completed(futures):
+            yield from fan_out(futures[future], future.result())
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def search_entities(entities, prompt_template, serpapi_key, max_workers=None, rate_limiter=None):
+    """
+    Perform searches for all entities concurrently.
+    Results are returned keyed by entity, in the same order as `entities`.
+    """
+    completed = dict(iter_search_entities(entities, prompt_template, serpapi_key, max_workers, rate_limiter))
+    results = {entity: completed[entity] for entity in entities}
 
     logger.info("Completed all searches.")
     return results
+
+async def async_search_entity(http_client, entity, prompt_template, serpapi_key, rate_limiter=None):
+    """
+    Async version of `search_entity` that calls the SerpAPI JSON endpoint with an httpx.AsyncClient.
+    Shares the on-disk search cache with the synchronous path; cache reads and writes run in
+    worker threads so SQLite does not block the event loop.
+    """
+    params = build_search_params(entity, prompt_template, serpapi_key)
+    query = params["q"]
+
+    cache_key = search_cache_key(params)
+    cached = await asyncio.to_thread(get_cached_search, cache_key)
+    if cached is not None:
+        logger.info(f"Cache hit for '{query}'")
+        return cached
+
+    last_error = None
+    for attempt in range(SEARCH_MAX_RETRIES + 1):
+        retry_after = None
+        try:
+            async with rate_limiter.slot_async() if rate_limiter is not None else nullcontext():
+                with span("search_call"):
+                    response = await http_client.get(SERPAPI_SEARCH_URL, params=params)
+            retry_after = parse_duration(response.headers.get("retry-after"))
+            try:
+                results = response.json()
+            except ValueError:
+                results = {"error": f"HTTP {response.status_code}"}
+            outcome = classify_search_response(results, response.status_code)
+        except Exception as e:
+            results, outcome = {"error": str(e)}, "transient"
+        log_payload(logger, "Raw search results for '%s': %s", query, results)
+
+        if outcome in ("ok", "empty"):
+            if rate_limiter is not None:
+                rate_limiter.record_success()
+            # Only cache definitive answers so failed searches are retried next time
+            output = parse_organic_results(results)
+            await asyncio.to_thread(cache_search, cache_key, outcome, output)
+            return output
+        if outcome == "failed":
+            logger.warning(f"Search for '{query}' failed: {results.get('error')}")
+            return parse_organic_results(results)
+
+        last_error = results.get("error")
+        if attempt < SEARCH_MAX_RETRIES:
+            await asyncio.sleep(_handle_search_outcome(outcome, attempt, rate_limiter, retry_after))
+
+    logger.error(f"Error performing search for {entity} after {SEARCH_MAX_RETRIES} retries: {last_error}")
+    return []
+
+async def async_iter_search_entities(entities, prompt_template, serpapi_key, max_in_flight=None, rate_limiter=None):
+    """
+    Search for all entities on the event loop, yielding (entity, results) pairs as each search completes.
+    At most `max_in_flight` searches wait on SerpAPI at once.
+    """
+    import httpx
+
+    semaphore = asyncio.Semaphore(max_in_flight or SEARCH_MAX_WORKERS)
+    rate_limiter = rate_limiter or search_rate_limiter
+    representatives, fan_out, blanks = dedupe_entities(entities, "search entities")
+    for entity in blanks:
+        yield entity, []
+
+    async with httpx.AsyncClient(timeout=httpx.Timeout(30.0)) as http_client:
+        async def bounded_search(entity):
+            async with semaphore:
+                logger.info(f"Searching for entity: {entity}")
+                return entity, await async_search_entity(http_client, entity, prompt_template, serpapi_key, rate_limiter)
+
+        tasks = [asyncio.ensure_future(bounded_search(entity)) for entity in representatives]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                for pair in fan_out(*await next_done):
+                    yield pair
+        finally:
+            for task in tasks:
+                task.cancel()
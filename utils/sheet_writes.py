@@ -0,0 +1,79 @@
+import json
+import logging
+import uuid
+from utils.database import SheetWrite, get_session
+from utils.google_sheets import write_column_values
+
+logger = logging.getLogger(__name__)
+
+def _status(write):
+    return {
+        "write_id": write.id,
+        "status": write.status,
+        "column": write.column_name,
+        "rows_written": write.rows_written,
+        "total": len(json.loads(write.values)),
+        "error": write.error,
+    }
+
+def create_sheet_write(sheet_url, column, values, start_row=0):
+    """
+    Persist a pending write of `values` to `column`, starting at data row `start_row`.
+    Returns the write ID.
+    """
+    write_id = uuid.uuid4().hex
+    db = get_session()
+    try:
+        db.add(SheetWrite(
+            id=write_id, sheet_url=sheet_url, column_name=column, start_row=start_row,
+            values=json.dumps(values), rows_written=0, status="pending"
+        ))
+        db.commit()
+    finally:
+        db.close()
+    return write_id
+
+def run_sheet_write(write_id):
+    """
+    Write the remaining values of a write, recording progress after every API call so a write
+    that fails partway can be run again from where it stopped.
+    Returns the write status afterwards, or None if the write does not exist.
+    """
+    db = get_session()
+    try:
+        write = db.get(SheetWrite, write_id)
+        if write is None:
+            return None
+        if write.status == "completed":
+            return _status(write)
+
+        def record_progress(rows_written):
+            write.rows_written = rows_written
+            db.commit()
+
+        try:
+            write_column_values(
+                write.sheet_url, write.column_name, json.loads(write.values), write.start_row,
+                offset=write.rows_written, on_progress=record_progress
+            )
+            write.status = "completed"
+            write.error = None
+        except Exception as e:
+            logger.error(f"Sheet write {write_id} failed after {write.rows_written} rows: {e}")
+            write.status = "failed"
+            write.error = str(e)
+        db.commit()
+        return _status(write)
+    finally:
+        db.close()
+
+def get_sheet_write(write_id):
+    """
+    Return a write's status and progress, or None if the write does not exist.
+    """
+    db = get_session()
+    try:
+        write = db.get(SheetWrite, write_id)
+        return _status(write) if write is not None else None
+    finally:
+        db.close()
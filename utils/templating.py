@@ -0,0 +1,105 @@
+import string
+from collections import deque
+from utils.dataset_store import read_table
+
+# Placeholders filled in by the extraction step rather than from a dataset column
+DEFERRED_FIELDS = ("context",)
+
+def template_fields(template):
+    """
+    Return the column names a prompt template references, in order of first use.
+    Raises ValueError for unbalanced braces, positional ('{}') placeholders and format specs.
+    """
+    fields = []
+    for _, field, format_spec, conversion in string.Formatter().parse(template):
+        if field is None or field in DEFERRED_FIELDS:
+            continue
+        if not field:
+            raise ValueError("Placeholders must name a column, e.g. '{company}'.")
+        if format_spec or conversion:
+            raise ValueError(f"Placeholder '{{{field}}}' cannot have a format spec or conversion.")
+        if field not in fields:
+            fields.append(field)
+    if not fields:
+        raise ValueError("The template does not reference any column.")
+    return fields
+
+def render_table(table, template):
+    """
+    Render `template` for every row of an Arrow table in one vectorized pass, with Arrow
+    compute kernels rather than a per-row str.format.
+    Missing values render as empty text; rows where every referenced column is empty render as
+    "" so they are treated as blank. Returns a list of strings, one per row.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    parts = []
+    blank = None
+    for literal, field, _, _ in string.Formatter().parse(template):
+        if literal:
+            parts.append(pa.scalar(literal))
+        if field is None:
+            continue
+        if field in DEFERRED_FIELDS:
+            parts.append(pa.scalar("{" + field + "}"))
+            continue
+        text = pc.fill_null(pc.cast(table.column(field), pa.string()), "")
+        parts.append(text)
+        empty = pc.equal(pc.utf8_trim_whitespace(text), "")
+        blank = empty if blank is None else pc.and_(blank, empty)
+
+    rendered = pc.binary_join_element_wise(*parts, "")
+    return pc.if_else(blank, "", rendered).to_pylist()
+
+def render_dataset_rows(dataset_id, template, start_row=0, end_row=None):
+    """
+    Render `template` for rows [start_row, end_row) of a stored dataset, reading only the
+    columns it references.
+    Returns {row ID: rendered text} in row order, where the row ID is the row's position in the
+    dataset, as a string. Raises KeyError for an unknown dataset or column and ValueError for an
+    unsupported template.
+    """
+    start_row = max(start_row, 0)
+    table = read_table(dataset_id, start_row, end_row, columns=template_fields(template))
+    texts = render_table(table, template) if table.num_rows else []
+    return {str(start_row + offset): text for offset, text in enumerate(texts)}
+
+def rows_search_results(rows, search_results):
+    """
+    Re-key search results stored by row ID by each row's rendered extraction prompt. Rows that
+    render the same prompt share one extraction, which uses the first such row's search results.
+    """
+    by_text = {}
+    for row_id, text in rows.items():
+        by_text.setdefault(text, search_results.get(row_id, []))
+    return by_text
+
+def _row_queues(rows):
+    queues = {}
+    for row_id, text in rows.items():
+        queues.setdefault(text, deque()).append(row_id)
+    return queues
+
+def key_by_row(pairs, rows):
+    """
+    Turn the (rendered text, value) pairs of a search or extraction over the texts of `rows`,
+    one pair per row in any order, into (row ID, value) pairs.
+    """
+    queues = _row_queues(rows)
+    try:
+        for text, value in pairs:
+            yield queues[str(text)].popleft(), value
+    finally:
+        pairs.close()
+
+async def key_by_row_async(pairs, rows):
+    """
+    Like `key_by_row`, for an async iterator of pairs.
+    """
+    queues = _row_queues(rows)
+    try:
+        async for text, value in pairs:
+            yield queues[str(text)].popleft(), value
+    finally:
+        await pairs.aclose()
@@ -0,0 +1,53 @@
+import json
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+# Columnar alternative to JSON records for endpoints that return table rows
+ARROW_STREAM_MIMETYPE = "application/vnd.apache.arrow.stream"
+JSON_MIMETYPE = "application/json"
+
+# Non-tabular response fields (dataset_id, row_count, ...) travel in the schema metadata
+RESPONSE_METADATA_KEY = b"response"
+
+def prefers_arrow(accept_header):
+    """
+    Return True if an Accept header ranks Arrow IPC above JSON. JSON wins ties and '*/*'.
+    """
+    accept = parse_accept_header(accept_header or "", MIMEAccept)
+    return accept.best_match([JSON_MIMETYPE, ARROW_STREAM_MIMETYPE]) == ARROW_STREAM_MIMETYPE
+
+def table_to_ipc(table, metadata=None):
+    """
+    Serialize an Arrow table as an IPC stream, with `metadata` stored as JSON in the schema.
+    Record batches are zstd-compressed when pyarrow was built with zstd.
+    """
+    import pyarrow as pa
+
+    schema_metadata = dict(table.schema.metadata or {})
+    schema_metadata[RESPONSE_METADATA_KEY] = json.dumps(metadata or {}).encode("utf-8")
+    table = table.replace_schema_metadata(schema_metadata)
+
+    options = pa.ipc.IpcWriteOptions(compression="zstd" if pa.Codec.is_available("zstd") else None)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def dataframe_to_ipc(df, metadata=None):
+    """
+    Serialize a DataFrame as an Arrow IPC stream (see `table_to_ipc`).
+    """
+    import pyarrow as pa
+
+    return table_to_ipc(pa.Table.from_pandas(df, preserve_index=False), metadata)
+
+def ipc_to_dataframe(data):
+    """
+    Decode an Arrow IPC stream into (DataFrame, metadata dict).
+    The buffer is read in place, without copying it into Python objects first.
+    """
+    import pyarrow as pa
+
+    table = pa.ipc.open_stream(pa.py_buffer(data)).read_all()
+    metadata = json.loads((table.schema.metadata or {}).get(RESPONSE_METADATA_KEY, b"{}"))
+    return table.to_pandas(), metadata